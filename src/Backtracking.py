@@ -1,11 +1,673 @@
+import heapq
+import time
+from collections import OrderedDict, deque
 import matplotlib.pyplot as plt
 import networkx as nx
 import Graph as G
 
 COLORS = {'red', 'green', 'blue'}   # Add another color, like "yellow"
 
+# Colors added to the palette when more colors than COLORS are needed (then the matplotlib cycle colors C0, C1, ...)
+EXTRA_COLORS = ('yellow', 'purple', 'orange', 'cyan', 'magenta', 'brown', 'pink', 'gray', 'olive')
 
-def backtrack_fc(nxGraph, graph, assignment, nodes, animate):
+# Revise procedures available for the propagation of MAC
+PROPAGATORS = ("AC3", "Residual")
+
+# Orderings available for the values of the selected variable
+VALUE_ORDERINGS = ("LCV", "Palette")
+
+# Default number of nogoods kept by the search (least recently used ones are evicted)
+NOGOOD_CAPACITY = 10000
+
+# Maximum number of assignments of a nogood: larger conflict sets are too specific to be met again and are not stored
+MAX_NOGOOD_SIZE = 10
+
+
+def get_palette(n_colors=None):
+
+    """
+
+    Returns the indexed color palette: the domain of each node is a bitmask in which bit i is set if the color
+    palette[i] is still available
+
+    :param n_colors: (int) number of colors of the palette, None to use the colors in COLORS
+    :return:         (list) sorted list of the colors in COLORS, truncated or extended with other color names
+
+    """
+
+    palette = sorted(COLORS)
+    if n_colors is None:
+        return palette
+
+    palette += [color for color in EXTRA_COLORS if color not in COLORS]
+    palette += [f"C{i}" for i in range(n_colors - len(palette))]
+
+    return palette[:n_colors]
+
+
+def get_full_domain(n_colors):
+
+    """
+
+    Returns the bitmask of a domain containing all the n_colors colors of the palette
+
+    :param n_colors: (int) number of colors of the palette
+    :return:         (int) bitmask with the first n_colors bits set
+
+    """
+
+    return (1 << n_colors) - 1
+
+
+def iter_colors(domain):
+
+    """
+
+    Returns the indexes of the colors contained in the domain bitmask
+
+    :param domain: (int) bitmask of the domain
+    :return:       (generator) indexes of the colors in ascending order
+
+    """
+
+    while domain:
+        bit = domain & -domain
+        yield bit.bit_length() - 1
+        domain ^= bit
+
+
+def is_singleton(domain):
+
+    """
+
+    Checks if the domain bitmask contains exactly one color
+
+    :param domain: (int) bitmask of the domain
+    :return:       True if there is only one color left, False otherwise
+
+    """
+
+    return domain != 0 and domain & (domain - 1) == 0
+
+
+def decode_assignment(assignment, palette):
+
+    """
+
+    Converts the bitmask domains into lists of colors
+
+    :param assignment:  (list) list of the bitmask domains of the nodes, indexed by node id
+    :param palette:     (list) indexed color palette
+    :return:            (list) list of the domains of the nodes as lists of colors [[color]]
+
+    """
+
+    return [[palette[color] for color in iter_colors(domain)] for domain in assignment]
+
+
+class SearchStats:
+    """
+
+    Class that collects the statistics of a backtracking search, returned alongside the solution to explain where the
+    search spent its effort.
+
+    Attributes:
+        self.nodes_expanded     (int) number of nodes of the search tree (variables selected)
+        self.backtracks         (int) number of times the search went back because a variable had no values left
+        self.backjumps          (int) number of levels skipped by the backjumps (beyond the previous level)
+        self.nogoods_recorded   (int) number of nogoods added to the nogood store
+        self.nogood_prunes      (int) number of times a stored nogood removed a color or rejected an assignment
+        self.symmetry_prunes    (int) number of values skipped because they are a permutation of a value already tried
+        self.nodes_peeled       (int) number of graph nodes removed by the preprocessing (colored after the search)
+        self.blocks_solved      (int) number of biconnected blocks the preprocessing split the graph into
+        self.moves              (int) number of color changes made by the local search
+        self.restarts           (int) number of restarts of the local search
+        self.values_tried       (int) number of values tried for the selected variables
+        self.fc_prunes          (int) number of colors removed by forward checking
+        self.ac_prunes          (int) number of colors removed by AC-3
+        self.revisions          (int) number of arc revisions made by AC-3
+        self.support_checks     (int) number of supports searched in the domain of the second node of an arc
+        self.queue_pushes       (int) number of arcs added to the AC-3 queue
+        self.max_depth          (int) maximum depth reached by the search
+        self.time_select        (float) seconds spent selecting the variables
+        self.time_order         (float) seconds spent ordering the values
+        self.time_propagate     (float) seconds spent in the inferences (FC/MAC)
+        self.time_total         (float) total seconds of the search
+
+    """
+
+    def __init__(self):
+        self.nodes_expanded = 0
+        self.backtracks = 0
+        self.backjumps = 0
+        self.nogoods_recorded = 0
+        self.nogood_prunes = 0
+        self.symmetry_prunes = 0
+        self.nodes_peeled = 0
+        self.blocks_solved = 0
+        self.moves = 0
+        self.restarts = 0
+        self.values_tried = 0
+        self.fc_prunes = 0
+        self.ac_prunes = 0
+        self.revisions = 0
+        self.support_checks = 0
+        self.queue_pushes = 0
+        self.max_depth = 0
+        self.time_select = 0.0
+        self.time_order = 0.0
+        self.time_propagate = 0.0
+        self.time_total = 0.0
+
+    def to_dict(self):
+
+        """
+
+        Returns the statistics as a dictionary (e.g. to be written to JSON/CSV)
+
+        :return: (dict) dictionary {statistic name: value}
+
+        """
+
+        return dict(vars(self))
+
+    def __str__(self):
+        return "\n".join(f"{name:<16} {value:.6f}" if isinstance(value, float) else f"{name:<16} {value}"
+                         for name, value in vars(self).items())
+
+
+class SearchState:
+    """
+
+    Class that represents the state of the backtracking search: the current domains of the nodes and the trail (undo
+    log) of every domain reduction. Instead of copying the domains at each search node, each reduction is recorded on
+    the trail and rolled back when the search backtracks.
+
+    Each reduction also carries its reason: the bitmask of the decision levels (bit l is the node assigned at level l)
+    whose assignments caused it. The reasons of an emptied domain give the conflict set used for backjumping, and the
+    conflict sets of the exhausted levels can be kept in a bounded store of nogoods.
+
+    The colors are interchangeable when every node starts with the full domain: in that case the state counts the
+    assigned nodes of each color, so that the search tries only one of the colors not used yet (symmetry breaking).
+
+    Attributes:
+        self._compiled          (CompiledGraph) integer-indexed structure of the graph
+        self._domains           (list) list of the current bitmask domains of the nodes, indexed by node id
+        self._trail             (list) list of tuples (node id, previous bitmask domain), one for each reduction
+        self._assigned          (bytearray) 1 for the nodes already assigned by the search, indexed by node id
+        self._n_assigned        (int) number of nodes already assigned by the search
+        self._priorities        (list) heap of the unassigned nodes, tuples (domain size, -degree, node id). Entries
+                                are added whenever the domain of a node changes; outdated ones are skipped when read
+        self._supports          (list) number of neighbors of each node whose domain still contains each color,
+                                indexed by node id * n_colors + color (read by the LCV heuristic)
+        self._in_queue          (bytearray) marker of the arcs currently in the AC-3 queue, indexed by arc id
+        self._propagator        (String) revise procedure used by AC-3: "AC3" or "Residual"
+        self._n_colors          (int) number of colors of the palette
+        self._residues          (list) last support found for each (arc, color), indexed by arc * n_colors + color
+                                (-1 if none)
+        self._stats             (SearchStats) statistics of the search
+        self._value_ordering    (String) ordering of the values: "LCV" or "Palette" (see VALUE_ORDERINGS)
+        self._reasons           (list) bitmask of the decision levels responsible for the current domain of each node
+        self._levels            (list) decision level at which each assigned node was assigned, indexed by node id
+        self._level_nodes       (list) node assigned at each decision level
+        self._conflict          (int) bitmask of the decision levels responsible for the last emptied domain
+        self._max_nogoods       (int) maximum number of nogoods stored, 0 to disable the nogood store
+        self._nogoods           (OrderedDict) stored nogoods in least recently used order: frozensets of
+                                (node id, color) assignments that cannot be extended to a solution
+        self._watches           (dict) Dict containing key: (node id, color), value: set of the nogoods containing it
+        self._symmetry_breaking (bool) True if only one unused color is tried for each node (symmetry breaking)
+        self._color_counts      (list) number of assigned nodes of each color
+        self._hints             (list) color to be tried first for each node (-1 for none), None if there are no hints
+
+    """
+
+    def __init__(self, compiled, domains, propagator="AC3", stats=None, value_ordering="LCV", max_nogoods=0,
+                 symmetry_breaking=False, hints=None):
+        self._compiled = compiled
+        self._domains = list(domains)
+        self._trail = []
+        self._reasons = [0] * compiled.get_n_nodes()
+        self._levels = [0] * compiled.get_n_nodes()
+        self._level_nodes = []
+        self._conflict = 0
+        self._max_nogoods = max_nogoods
+        self._nogoods = OrderedDict()
+        self._watches = {}
+        self._assigned = bytearray(compiled.get_n_nodes())
+        self._n_assigned = 0
+        self._neg_degrees = tuple((-compiled.get_degrees()).tolist())
+        self._priorities = []
+        self.rebuild_priorities()
+        self._in_queue = bytearray(compiled.get_n_arcs())
+        self._propagator = propagator
+        self._n_colors = max(domains, default=0).bit_length()
+        self._supports = [0] * (compiled.get_n_nodes() * self._n_colors)
+        for node, domain in enumerate(self._domains):
+            self.update_supports(node, domain, 1)
+        self._residues = [-1] * (compiled.get_n_arcs() * self._n_colors) if propagator == "Residual" else []
+        self._stats = stats if stats is not None else SearchStats()
+        self._value_ordering = value_ordering
+
+        # The colors are symmetric only if no node has a restricted initial domain
+        full_domain = get_full_domain(self._n_colors)
+        self._symmetry_breaking = symmetry_breaking and all(domain == full_domain for domain in self._domains)
+        self._color_counts = [0] * self._n_colors
+        self._hints = hints
+
+    def get_compiled(self):
+        return self._compiled
+
+    def get_domains(self):
+        return self._domains
+
+    def get_in_queue(self):
+        return self._in_queue
+
+    def get_value_ordering(self):
+        return self._value_ordering
+
+    def get_supports(self):
+        return self._supports
+
+    def update_supports(self, node, colors, delta):
+
+        """
+
+        Updates the color counters of the neighbors of node when colors are removed from (delta = -1) or restored to
+        (delta = 1) the domain of node
+
+        :param node:    (int) id of the node whose domain changed
+        :param colors:  (int) bitmask of the colors removed or restored
+        :param delta:   (int) -1 if the colors are removed, 1 if they are restored
+
+        """
+
+        supports = self._supports
+        n_colors = self._n_colors
+        neighbors = self._compiled.get_neighbors(node)
+        for color in iter_colors(colors):
+            for neighbor in neighbors:
+                supports[neighbor * n_colors + color] += delta
+
+    def get_n_assigned(self):
+        return self._n_assigned
+
+    def is_symmetry_breaking(self):
+        return self._symmetry_breaking
+
+    def get_hints(self):
+        return self._hints
+
+    def count_color(self, domain, delta):
+
+        """
+
+        Updates the number of assigned nodes of the color of domain, if it is a single color
+
+        :param domain:  (int) bitmask domain of an assigned node
+        :param delta:   (int) 1 if the node gets the color, -1 if it loses it
+
+        """
+
+        if is_singleton(domain):
+            self._color_counts[domain.bit_length() - 1] += delta
+
+    def get_used_colors(self):
+
+        """
+
+        Returns the colors assigned to at least one node
+
+        :return: (int) bitmask of the used colors
+
+        """
+
+        used = 0
+        for color, count in enumerate(self._color_counts):
+            if count:
+                used |= 1 << color
+
+        return used
+
+    def is_assigned(self, node):
+        return self._assigned[node] == 1
+
+    def assign(self, node):
+
+        """
+
+        Marks node as assigned at the next decision level: it is not returned anymore by select_unassigned_variable
+
+        :param node: (int) id of the node
+
+        """
+
+        self._levels[node] = self._n_assigned
+        self._level_nodes.append(node)
+        self._assigned[node] = 1
+        self.count_color(self._domains[node], 1)
+        self._n_assigned += 1
+
+    def unassign(self, node):
+
+        """
+
+        Marks node as unassigned again (when the search backtracks over it)
+
+        :param node: (int) id of the node
+
+        """
+
+        self._level_nodes.pop()
+        self.count_color(self._domains[node], -1)
+        self._assigned[node] = 0
+        self._n_assigned -= 1
+        heapq.heappush(self._priorities, (self._domains[node].bit_count(), self._neg_degrees[node], node))
+
+    def rebuild_priorities(self):
+
+        """
+
+        Rebuilds the heap of the unassigned nodes from scratch, dropping the outdated entries
+
+        """
+
+        self._priorities = [(domain.bit_count(), self._neg_degrees[node], node)
+                            for node, domain in enumerate(self._domains) if not self._assigned[node]]
+        heapq.heapify(self._priorities)
+
+    def get_mrv_node(self):
+
+        """
+
+        Returns the unassigned node with the smallest domain (MRV heuristic); ties are broken by the highest degree
+        (degree heuristic) and then by the lowest id. The cost is O(log n) for each outdated entry skipped.
+
+        :return: (int) id of the node, None if all the nodes are assigned
+
+        """
+
+        priorities = self._priorities
+        domains = self._domains
+        assigned = self._assigned
+
+        # Outdated entries pile up with the reductions and the undos: the heap is rebuilt when they are too many
+        if len(priorities) > 4 * len(domains) + 64:
+            self.rebuild_priorities()
+            priorities = self._priorities
+
+        while priorities:
+            size, _, node = priorities[0]
+            if not assigned[node] and domains[node].bit_count() == size:
+                return node
+            heapq.heappop(priorities)
+
+        return None
+
+    def get_propagator(self):
+        return self._propagator
+
+    def get_n_colors(self):
+        return self._n_colors
+
+    def get_residues(self):
+        return self._residues
+
+    def get_stats(self):
+        return self._stats
+
+    def get_reasons(self):
+        return self._reasons
+
+    def get_level_bit(self, node):
+        return 1 << self._levels[node]
+
+    def get_conflict(self):
+        return self._conflict
+
+    def reduce(self, node, domain, reason):
+
+        """
+
+        Replaces the domain of node with the given (smaller) domain, recording the previous one and its reason on the
+        trail. If the domain becomes empty, its reason is the conflict set of the failure.
+
+        :param node:    (int) id of the node
+        :param domain:  (int) new bitmask domain of the node
+        :param reason:  (int) bitmask of the decision levels responsible for the new domain
+
+        """
+
+        self._trail.append((node, self._domains[node], self._reasons[node]))
+        self.update_supports(node, self._domains[node] & ~domain, -1)
+        if self._assigned[node]:
+            self.count_color(self._domains[node], -1)
+            self.count_color(domain, 1)
+        self._domains[node] = domain
+        self._reasons[node] = reason
+        if domain == 0:
+            self._conflict = reason
+        if not self._assigned[node]:
+            heapq.heappush(self._priorities, (domain.bit_count(), self._neg_degrees[node], node))
+
+    def mark(self):
+
+        """
+
+        Returns the current position of the trail, to be used with undo
+
+        :return: (int) length of the trail
+
+        """
+
+        return len(self._trail)
+
+    def undo(self, mark):
+
+        """
+
+        Rolls back all the domain reductions recorded after the given mark (in reverse order)
+
+        :param mark: (int) position of the trail returned by mark()
+
+        """
+
+        trail = self._trail
+        domains = self._domains
+        reasons = self._reasons
+        assigned = self._assigned
+        priorities = self._priorities
+        neg_degrees = self._neg_degrees
+        while len(trail) > mark:
+            node, domain, reason = trail.pop()
+            self.update_supports(node, domain & ~domains[node], 1)
+            if assigned[node]:
+                self.count_color(domains[node], -1)
+                self.count_color(domain, 1)
+            domains[node] = domain
+            reasons[node] = reason
+            if not assigned[node]:
+                heapq.heappush(priorities, (domain.bit_count(), neg_degrees[node], node))
+
+    def add_nogood(self, conflict):
+
+        """
+
+        Stores the assignments of the decision levels in conflict as a nogood: together they cannot be extended to a
+        solution. When the store is full the least recently used nogood is evicted.
+
+        :param conflict: (int) bitmask of the decision levels of the nogood (all of them currently assigned)
+
+        """
+
+        if not self._max_nogoods or not conflict or conflict.bit_count() > MAX_NOGOOD_SIZE:
+            return
+
+        nogood = []
+        while conflict:
+            bit = conflict & -conflict
+            node = self._level_nodes[bit.bit_length() - 1]
+            nogood.append((node, self._domains[node].bit_length() - 1))
+            conflict ^= bit
+        nogood = frozenset(nogood)
+
+        if nogood in self._nogoods:
+            self._nogoods.move_to_end(nogood)
+            return
+
+        self._nogoods[nogood] = None
+        for literal in nogood:
+            self._watches.setdefault(literal, set()).add(nogood)
+        self._stats.nogoods_recorded += 1
+
+        if len(self._nogoods) > self._max_nogoods:
+            evicted, _ = self._nogoods.popitem(last=False)
+            for literal in evicted:
+                self._watches[literal].discard(evicted)
+
+    def check_nogoods(self, node, color):
+
+        """
+
+        Checks the stored nogoods containing the assignment node = color that has just been made. A nogood whose
+        assignments all hold rejects it; if all but one hold, the color of the remaining one is removed from the
+        domain of its node.
+
+        :param node:    (int) id of the node just assigned
+        :param color:   (int) index of the color assigned to node
+        :return:        True if no nogood is violated and no domain becomes empty, False otherwise
+
+        """
+
+        watches = self._watches.get((node, color))
+        if not watches:
+            return True
+
+        domains = self._domains
+        assigned = self._assigned
+        for nogood in list(watches):
+            unit = None
+            reason = 0
+            for other, other_color in nogood:
+                if assigned[other] and domains[other] == 1 << other_color:
+                    reason |= 1 << self._levels[other]
+                elif unit is None and not assigned[other] and (domains[other] >> other_color) & 1:
+                    unit = other, other_color
+                else:
+                    break   # The nogood cannot be violated by the current assignment
+            else:
+                self._nogoods.move_to_end(nogood)
+                self._stats.nogood_prunes += 1
+                if unit is None:
+                    self._conflict = reason
+                    return False
+                other, other_color = unit
+                self.reduce(other, domains[other] & ~(1 << other_color), self._reasons[other] | reason)
+                if domains[other] == 0:
+                    return False
+
+        return True
+
+
+def backtrack(state, inference, nodes, nxGraph, animate, bt_type, max_nodes=None):
+
+    """
+
+    Iterative backtracking search shared by FC and MAC. Each level of the search tree is a frame of an explicit stack
+    (selected node, ordered values, index of the next value, trail mark, conflict set), so the depth of the search is
+    not limited by the recursion limit. Before trying a new value the reductions made by the previous one are rolled
+    back with the trail.
+
+    The search uses conflict-directed backjumping: the conflict set of a level collects the decision levels
+    responsible for the reductions of the domain of its node and for the failures of its values. When a level has no
+    values left the search jumps back to the deepest level of its conflict set, skipping the levels that had nothing
+    to do with the failure, and the conflict set is merged into the one of that level (and stored as a nogood).
+
+    :param state:       (SearchState) state of the search
+    :param inference:   (function) inference procedure (forward_checking or mac), False if a domain becomes empty
+    :param nodes:       (list) list of Nodes of the graph (only used for the animation)
+    :param nxGraph:     (nxGraph) networkx graph (only used for the animation)
+    :param animate:     (bool) True if we want animation, false otherwise
+    :param bt_type:     (String) "FC" or "MAC", used for the animation
+    :param max_nodes:   (int) maximum number of search nodes to expand, None for no limit
+    :return:            (list) list corresponding to the final color assignment (bitmask) of each node id,
+                        False if there is no possible complete assignment, None if max_nodes was reached
+
+    """
+
+    stats = state.get_stats()
+    clock = time.perf_counter
+    start = clock()
+    stack = []
+
+    while True:
+        if check_assignment_complete(state) is True:
+            stats.time_total += clock() - start
+            return list(state.get_domains())
+
+        t0 = clock()
+        var = select_unassigned_variable(state)
+        t1 = clock()
+        stack.append([var, order_domain_values(state, var), 0, state.mark(), state.get_reasons()[var]])
+        t2 = clock()
+        stats.time_select += t1 - t0
+        stats.time_order += t2 - t1
+        stats.nodes_expanded += 1
+        stats.max_depth = max(stats.max_depth, len(stack))
+
+        if max_nodes is not None and stats.nodes_expanded > max_nodes:
+            stats.time_total += clock() - start
+            return None
+
+        state.assign(var)
+
+        # Finds the next consistent value of the deepest frame, backjumping when a frame has no values left
+        while stack:
+            frame = stack[-1]
+            var, values, index, mark, conflict = frame
+
+            while index < len(values):
+                value = values[index]
+                index += 1
+                stats.values_tried += 1
+                if not check_value_consistent(var, value, state):
+                    conflict |= get_value_conflict(var, value, state)
+                    continue
+                t0 = clock()
+                consistent = inference(state, var, value) and state.check_nogoods(var, value)
+                stats.time_propagate += clock() - t0
+                if consistent:
+                    break
+                conflict |= state.get_conflict()
+                state.undo(mark)
+            else:
+                conflict &= ~(1 << (len(stack) - 1))
+                target = conflict.bit_length() - 1   # -1 if the conflict set is empty: there is no solution
+                stats.backtracks += 1
+                stats.backjumps += len(stack) - 2 - target
+                state.add_nogood(conflict)
+                while len(stack) > target + 1:
+                    state.unassign(stack.pop()[0])
+                if stack:
+                    stack[-1][4] |= conflict
+                    state.undo(stack[-1][3])
+                continue
+
+            frame[2] = index
+            frame[4] = conflict
+            break
+
+        if not stack:
+            stats.time_total += clock() - start
+            return False
+
+        if animate:
+            print_node_color(nodes, nxGraph, state.get_compiled().to_label_dict(
+                decode_assignment(state.get_domains(), get_palette())), bt_type)
+
+
+def backtrack_fc(compiled, assignment, nodes, nxGraph, animate, stats=None, verbose=True,
+                 max_nogoods=NOGOOD_CAPACITY, symmetry_breaking=True):
 
     """
 
@@ -15,40 +677,31 @@ def backtrack_fc(nxGraph, graph, assignment, nodes, animate):
     inferences are made (using Forward Checking) and the nodes are correctly colored. We repeat the process until all
     the nodes are assigned to the right color or there is no possible complete assignment.
 
-    :param nxGraph:     (nxGraph)
-    :param graph:       (dict) dictionary corresponding to the structure of the graph {node: [neighbors]}
-    :param assignment:  (dict) dictionary corresponding to the initial color assignment for each node {node: [color]}
-    :param nodes:       (list) list of Nodes of the graph
+    :param compiled:    (CompiledGraph) integer-indexed structure of the graph
+    :param assignment:  (list) list of the initial bitmask domains of the nodes, indexed by node id
+    :param nodes:       (list) list of Nodes of the graph (only used for the animation)
+    :param nxGraph:     (nxGraph) networkx graph (only used for the animation)
     :param animate:     (bool) True if we want animation, false otherwise
-    :return:            (dict) dictionary corresponding to the final color assignment
+    :param stats:       (SearchStats) if given, it is filled with the statistics of the search
+    :param verbose:     (bool) True if the final assignment is printed
+    :param max_nogoods: (int) size of the nogood store, 0 to disable it
+    :param symmetry_breaking: (bool) True to try only one unused color for each node (full initial domains only)
+    :return:            (list) list corresponding to the final color assignment (bitmask) of each node id
 
     """
 
-    if check_assignment_complete(graph, assignment) is True:
-        print("FC: ", assignment)
-        return assignment
-
-    var = select_unassigned_variable(nxGraph, graph, assignment)
+    state = SearchState(compiled, assignment, stats=stats, max_nogoods=max_nogoods,
+                        symmetry_breaking=symmetry_breaking)
+    result = backtrack(state, forward_checking, nodes, nxGraph, animate, "FC")
 
-    if var is not None:
-        for value in order_domain_values(graph, var, assignment):
-            if check_value_consistent(var, value, graph, assignment):
-                assignment[var] = [value]
-                inferences = forward_checking(graph, var, assignment)
-                if inferences is not None:
-                    assignment = inferences
-                    if animate:
-                        print_node_color(nodes, nxGraph, assignment, "FC")
-                    result = backtrack_fc(nxGraph, graph, assignment, nodes, animate)
-                    if result is not None:
-                        return result
-            else:
-                assignment[var].remove(value)
+    if result is not False and verbose:
+        print("FC: ", compiled.to_label_dict(decode_assignment(result, get_palette())))
 
-    return False
+    return result
 
 
-def backtrack_mac(nxGraph, graph, assignment, nodes, animate):
+def backtrack_mac(compiled, assignment, nodes, nxGraph, animate, propagator="AC3", stats=None, verbose=True,
+                  max_nogoods=NOGOOD_CAPACITY, symmetry_breaking=True):
 
     """
 
@@ -58,257 +711,349 @@ def backtrack_mac(nxGraph, graph, assignment, nodes, animate):
     to the node and then inferences are made (using MAC) and the nodes are correctly colored. We repeat the process
     until all the nodes are assigned to the right color or there is no possible complete assignment.
 
-    :param nxGraph:     (nxGraph)
-    :param graph:       (dict) dictionary corresponding to the structure of the graph {node: [neighbors]}
-    :param assignment:  (dict) dictionary corresponding to the initial color assignment for each node {node: [color]}
-    :param nodes:       (list) list of Nodes of the graph
+    :param compiled:    (CompiledGraph) integer-indexed structure of the graph
+    :param assignment:  (list) list of the initial bitmask domains of the nodes, indexed by node id
+    :param nodes:       (list) list of Nodes of the graph (only used for the animation)
+    :param nxGraph:     (nxGraph) networkx graph (only used for the animation)
     :param animate:     (bool) True if we want animation, false otherwise
-    :return:            (dict) dictionary corresponding to the final color assignment
+    :param propagator:  (String) revise procedure used by AC-3: "AC3" or "Residual" (see PROPAGATORS)
+    :param stats:       (SearchStats) if given, it is filled with the statistics of the search
+    :param verbose:     (bool) True if the final assignment is printed
+    :param max_nogoods: (int) size of the nogood store, 0 to disable it
+    :param symmetry_breaking: (bool) True to try only one unused color for each node (full initial domains only)
+    :return:            (list) list corresponding to the final color assignment (bitmask) of each node id
 
     """
 
-    if check_assignment_complete(graph, assignment) is True:
-        print("MAC:", assignment)
-        return assignment
+    state = SearchState(compiled, assignment, propagator, stats, max_nogoods=max_nogoods,
+                        symmetry_breaking=symmetry_breaking)
+    result = backtrack(state, mac, nodes, nxGraph, animate, "MAC")
 
-    var = select_unassigned_variable(nxGraph, graph, assignment)
+    if result is not False and verbose:
+        print("MAC:", compiled.to_label_dict(decode_assignment(result, get_palette())))
 
-    if var is not None:
-        for value in order_domain_values(graph, var, assignment):
-            if check_value_consistent(var, value, graph, assignment):
-                assignment[var] = [value]
-                inferences = mac(graph, var, assignment)
-                if inferences is not False:
-                    if animate:
-                        print_node_color(nodes, nxGraph, assignment, "MAC")
-                    result = backtrack_mac(nxGraph, graph, assignment, nodes, animate)
-                    if result is not None:
-                        return result
-            else:
-                assignment[var].remove(value)
-
-    return False
+    return result
 
 
-def check_value_consistent(var, value, graph, assignment):
+def check_value_consistent(var, value, state):
 
     """
 
     Checks if the current assignment is consistent (if neighbors nodes don't have the same color assignment)
 
-    :param var:         (Node) current node selected
-    :param value:       (String) current color assigned to the node
-    :param graph:       (dict) dictionary corresponding to the structure of the graph {node: [neighbors]}
-    :param assignment:  (dict) dictionary corresponding to the color assignment for each node {node: [color]}
+    :param var:         (int) id of the current node selected
+    :param value:       (int) index of the current color assigned to the node
+    :param state:       (SearchState) state of the search
     :return:            True if assignment consistent, False otherwise
 
     """
 
-    # If each node has len(colors) color assignments we don't check for consistency because we are in the first iteration
-    for colors in assignment.values():
-        n_colors = len(colors)
-        if n_colors != len(COLORS):
-            break
-        else:
-            return True
-
-    for neighbors in graph[var]:
-        for neighbor in neighbors:
-            if value == assignment[neighbor]:
-                return False
+    bit = 1 << value
+    assignment = state.get_domains()
+    for neighbor in state.get_compiled().get_neighbors(var):
+        if assignment[neighbor] == bit:
+            return False
 
     return True
 
 
-def check_assignment_complete(graph, assignment):
+def get_value_conflict(var, value, state):
 
     """
 
-    Checks if current assignment is complete (all the nodes have the correct color being assigned and there is consistency)
+    Returns the conflict set of a value rejected by check_value_consistent: the reasons of the neighbors left with
+    that color only
 
-    :param graph:       (dict) dictionary corresponding to the structure of the graph {node: [neighbors]}
-    :param assignment:  (dict) dictionary corresponding to the color assignment for each node {node: [color]}
-    :return:            True if assignment is complete, False otherwise
+    :param var:         (int) id of the current node selected
+    :param value:       (int) index of the color rejected
+    :param state:       (SearchState) state of the search
+    :return:            (int) bitmask of the decision levels responsible for the conflict
 
     """
 
-    for node in assignment:
-        if len(assignment[node]) > 1:   # There are still values to be removed from the domain!
-            return False
+    bit = 1 << value
+    assignment = state.get_domains()
+    reasons = state.get_reasons()
+    conflict = 0
+    for neighbor in state.get_compiled().get_neighbors(var):
+        if assignment[neighbor] == bit:
+            conflict |= reasons[neighbor]
 
-    for node in graph:
-        if node not in assignment:
-            return False
-        for neighbor in graph[node]:
-            if neighbor in assignment and assignment[node] == assignment[neighbor]:
-                return False
+    return conflict
 
-    return True
 
-
-def select_unassigned_variable(nxGraph, graph, assignment):
+def check_assignment_complete(state):
 
     """
 
-    Selects the unassigned nodes from the graph
+    Checks if current assignment is complete (all the nodes have been assigned a color). The inferences never leave a
+    color of an assigned node in the domain of its neighbors, so a complete assignment is also consistent.
 
-    :param nxGraph:     (nxGraph)
-    :param graph:       (dict) dictionary corresponding to the structure of the graph {node: [neighbors]}
-    :param assignment:  (dict) dictionary corresponding to the color assignment for each node {node: [color]}
-    :return:            (Node)
+    :param state:       (SearchState) state of the search
+    :return:            True if assignment is complete, False otherwise
 
     """
 
-    # Counts the number of nodes that have the length of their domain == 3
-    n_nodes_with_len_3 = sum(1 for node in graph if len(assignment[node]) == 3)
+    return state.get_n_assigned() == state.get_compiled().get_n_nodes()
 
-    # In case of first iteration (all the domains have length == 3) we consider the node with higher grade (heuristic)
-    if n_nodes_with_len_3 == len(graph):
-        unassigned_var = sorted(nxGraph.degree, key=lambda x: x[1], reverse=True)
-        return unassigned_var[0][0]
 
-    unassigned_var = [node for node in graph if len(assignment[node]) > 1]
+def select_unassigned_variable(state):
 
-    # If there are no variables left with length(domain) > 1
-    if not unassigned_var:
-        return None
+    """
+
+    Selects the unassigned node with the minimum remaining values (MRV heuristic) combined with the degree heuristic.
+    The nodes are kept in a priority queue updated at each domain reduction, so the whole graph is not scanned.
 
-    # Return the node with the lowest domain size
-    return min(unassigned_var, key=lambda n: len(assignment[n]))
+    :param state:       (SearchState) state of the search
+    :return:            (int) id of the selected node, None if all the nodes are assigned
 
+    """
 
-def order_domain_values(graph, var, assignment):
+    return state.get_mrv_node()
+
+
+def order_domain_values(state, var):
 
     """
 
-    Orders the domain of each variable
+    Orders the domain of each variable (Least Constraining Value heuristic): the colors are sorted by the number of
+    neighbors that still have them in their domain. The counters are kept up to date by the state at each reduction.
+    With the "Palette" value ordering the colors are simply tried in the order of the palette.
 
-    :param graph:       (dict) dictionary corresponding to the structure of the graph {node: [neighbors]}
-    :param var:         (Node) current node variable selected
-    :param assignment:  (dict) dictionary corresponding to the color assignment for each node {node: [color]}
-    :return:            (dict) a sorted list of colors corresponding to the domain of the current variable
+    If the state has value hints (e.g. a previous coloring used as warm start), the hinted color is tried first.
+
+    With symmetry breaking, the colors not assigned to any node yet are interchangeable: if one of them fails, any other
+    one fails in the same way, so only the first one is kept.
+
+    :param state:       (SearchState) state of the search
+    :param var:         (int) id of the current node variable selected
+    :return:            (list) a sorted list of the color indexes in the domain of the current variable
 
     """
 
-    domain = assignment[var]
-    neighbors = graph[var]
+    if state.get_value_ordering() == "Palette":
+        sorted_domain = list(iter_colors(state.get_domains()[var]))
+    else:
+        supports = state.get_supports()
+        base = var * state.get_n_colors()
+
+        # Sort the colors in the domain of the variable by their number of occurrences in the neighboring domains
+        sorted_domain = sorted(iter_colors(state.get_domains()[var]), key=lambda c: supports[base + c])
+
+    hints = state.get_hints()
+    if hints is not None and hints[var] in sorted_domain:
+        sorted_domain.remove(hints[var])
+        sorted_domain.insert(0, hints[var])
+
+    if not state.is_symmetry_breaking():
+        return sorted_domain
 
-    # Create a dictionary that maps each color to the number of times it appears in the domain of the neighboring nodes
-    n_assigned = {}
-    for neighbor in neighbors:
-        if neighbor in assignment:
-            for color in assignment[neighbor]:
-                n_assigned[color] = n_assigned.get(color, 0) + 1
+    used = state.get_used_colors()
+    values = []
+    unused_tried = False
+    for color in sorted_domain:
+        if (used >> color) & 1:
+            values.append(color)
+        elif not unused_tried:
+            values.append(color)
+            unused_tried = True
 
-    # Sort the colors in the domain of the variable by their number of occurrences in the neighboring domains
-    sorted_domain = sorted(domain, key=lambda c: n_assigned.get(c, 0))
+    state.get_stats().symmetry_prunes += len(sorted_domain) - len(values)
 
-    return sorted_domain
+    return values
 
 
-def forward_checking(graph, var, assignment):
+def forward_checking(state, var, value):
 
     """
 
-    Forward checking inference: removes the conflicting colors from the neighbor's domain of var. Returns a partial
-    assignment of colors.
+    Forward checking inference: assigns value to var and removes the conflicting colors from the neighbor's domain of
+    var. Every reduction is recorded on the trail of the state, with the decision level of var as its reason.
 
-    :param graph:       (dict) dictionary corresponding to the structure of the graph {node: [neighbors]}
-    :param var:         (Node) current node variable selected
-    :param assignment:  (dict) dictionary corresponding to the color assignment for each node {node: [color]}
-    :return:            (dict) a partial assignment of the colors to the nodes
+    :param state:       (SearchState) state of the search
+    :param var:         (int) id of the current node variable selected
+    :param value:       (int) index of the color assigned to var
+    :return:            True if no domain becomes empty, False otherwise
 
     """
 
-    # Creates a copy of the current assignment to modify
-    partial_assignment = assignment.copy()
+    assignment = state.get_domains()
+    reasons = state.get_reasons()
+    bit = 1 << value
+    level_bit = state.get_level_bit(var)
+    state.reduce(var, bit, level_bit)
 
     # Checks for conflicts with adjacent nodes
-    for neighbor in graph[var]:
-        if partial_assignment[var] in partial_assignment[neighbor]:
-            chosen_color = partial_assignment[var]
-            partial_assignment[neighbor].remove(chosen_color)
-            if partial_assignment[neighbor] is None:
-                return None
+    stats = state.get_stats()
+    for neighbor in state.get_compiled().get_neighbors(var):
+        if assignment[neighbor] & bit:
+            stats.fc_prunes += 1
+            state.reduce(neighbor, assignment[neighbor] & ~bit, reasons[neighbor] | level_bit)
+            if assignment[neighbor] == 0:
+                return False
 
-    return partial_assignment
+    return True
 
 
-def mac(graph, var, assignment):
+def mac(state, var, value):
 
     """
 
-    Maintaining arc consistency inference (MAC): uses the AC-3 algorithm to guarantee arc consistency between each node
-    of the graph.
+    Maintaining arc consistency inference (MAC): assigns value to var and uses the AC-3 algorithm to guarantee arc
+    consistency between each node of the graph. Only the domain of var has changed, so AC-3 is seeded with the arcs
+    (neighbor, var) only. Every reduction is recorded on the trail of the state.
 
-    :param graph:       (dict) dictionary corresponding to the structure of the graph {node: [neighbors]}
-    :param var:         (Node) current node variable selected
-    :param assignment:  (dict) dictionary corresponding to the color assignment for each node {node: [color]}
+    :param state:       (SearchState) state of the search
+    :param var:         (int) id of the current node variable selected
+    :param value:       (int) index of the color assigned to var
     :return:            True if consistency is detected, False otherwise
 
     """
 
-    q = get_neighbors(graph)
+    compiled = state.get_compiled()
+    reverse = compiled.get_reverse_arcs()
+    state.reduce(var, 1 << value, state.get_level_bit(var))
+
+    return ac3(state, [reverse[arc] for arc in compiled.get_arcs(var)])
+
+
+def ac3(state, arcs):
+
+    """
+
+    AC-3 algorithm starting from the given arcs. The queue is deduplicated with an in-queue marker for each arc: an arc
+    (x_k, x_i) is added again only when the domain of x_i is reduced, and never while it is already in the queue.
+
+    :param state:       (SearchState) state of the search
+    :param arcs:        (iterable) ids of the arcs (x_i, x_j) to revise first
+    :return:            True if consistency is detected, False if a domain becomes empty
 
-    while len(q) > 0:
-        (x_i, x_j) = q.pop()
-        if revise(x_i, x_j, assignment):
-            if len(assignment[x_i]) == 0:
+    """
+
+    compiled = state.get_compiled()
+    assignment = state.get_domains()
+    sources = compiled.get_arc_sources()
+    targets = compiled.get_arc_targets()
+    reverse = compiled.get_reverse_arcs()
+    in_queue = state.get_in_queue()
+    residual = state.get_propagator() == "Residual"
+    stats = state.get_stats()
+
+    q = deque()
+    for arc in arcs:
+        if not in_queue[arc]:
+            q.append(arc)
+            in_queue[arc] = 1
+    stats.queue_pushes += len(q)
+
+    while q:
+        arc = q.popleft()
+        in_queue[arc] = 0
+        x_i, x_j = sources[arc], targets[arc]
+        if revise_residual(arc, x_i, x_j, state) if residual else revise(x_i, x_j, state):
+            if assignment[x_i] == 0:
+                for arc_left in q:   # Leaves the markers clean for the next call
+                    in_queue[arc_left] = 0
                 return False
-            for neighbor in graph[x_i]:
-                if neighbor is not x_j:
-                    q.append((neighbor, x_i))
+            for arc_i in compiled.get_arcs(x_i):
+                if targets[arc_i] != x_j and not in_queue[reverse[arc_i]]:
+                    q.append(reverse[arc_i])
+                    in_queue[reverse[arc_i]] = 1
+                    stats.queue_pushes += 1
 
     return True
 
 
-def revise(x_i, x_j, assignment):
+def revise(x_i, x_j, state):
 
     """
 
     Implements the revise procedure to execute AC-3. Iterates between each possible color assignment of x_i, and for
-    each color searches for an available node x_j such that the assignment is consistent. Otherwise, it removes the
-    color from the available colors for the x_i node and is_revised is set True.
+    each color checks if x_j has another available color (bitwise: the domain of x_j without that color is not empty).
+    Otherwise, it removes the color from the available colors for the x_i node and is_revised is set True.
 
 
-    :param x_i:         (Node) first node to check for arc consistency
-    :param x_j:         (Node) second node to check for arc consistency
-    :param assignment:  (dict) dictionary corresponding to the color assignment for each node {node: [color]}
+    :param x_i:         (int) id of the first node to check for arc consistency
+    :param x_j:         (int) id of the second node to check for arc consistency
+    :param state:       (SearchState) state of the search
     :return:            True if there is a revise of the assignment, False otherwise
 
     """
 
-    is_revised = False
-    for x in assignment[x_i]:
-        is_consistent = False
-        for y in assignment[x_j]:
-            if x is not y:
-                is_consistent = True
-                break
-        if not is_consistent:
-            assignment[x_i].remove(x)
-            is_revised = True
+    assignment = state.get_domains()
+    domain_i = assignment[x_i]
+    domain_j = assignment[x_j]
+    n_checks = 0
+    for x in iter_colors(domain_i):
+        n_checks += 1
+        bit = 1 << x
+        if not domain_j & ~bit:
+            domain_i &= ~bit
+
+    stats = state.get_stats()
+    stats.revisions += 1
+    stats.support_checks += n_checks
+
+    if domain_i != assignment[x_i]:
+        stats.ac_prunes += (assignment[x_i] & ~domain_i).bit_count()
+        reasons = state.get_reasons()
+        state.reduce(x_i, domain_i, reasons[x_i] | reasons[x_j])
+        return True
 
-    return is_revised
+    return False
 
 
-def get_neighbors(graph):
+def revise_residual(arc, x_i, x_j, state):
 
     """
 
-    Returns the list of neighbors for each node in graph
+    Revise procedure based on residual supports (alternative to revise). For each color x of x_i the last support
+    found in the domain of x_j is stored: if that color is still available for x_j, x is supported without searching
+    the domain of x_j again. The residues are kept across revisions and search nodes (they do not need to be restored
+    when the search backtracks, they are only checked before being used).
 
-    :param graph:   (dict) dictionary corresponding to the structure of the graph {node: [neighbors]}
-    :return:        (list) list of tuples containing all the neighbors for each node [(node, neighbor)]
+    :param arc:         (int) id of the arc (x_i, x_j)
+    :param x_i:         (int) id of the first node to check for arc consistency
+    :param x_j:         (int) id of the second node to check for arc consistency
+    :param state:       (SearchState) state of the search
+    :return:            True if there is a revise of the assignment, False otherwise
 
     """
 
-    arcs = []
-    for node in graph:
-        for neighbor in graph[node]:
-            arcs.append((node, neighbor))
+    assignment = state.get_domains()
+    residues = state.get_residues()
+    base = arc * state.get_n_colors()
+    domain_i = assignment[x_i]
+    domain_j = assignment[x_j]
+    n_checks = 0
+    for x in iter_colors(domain_i):
+        residue = residues[base + x]
+        if residue >= 0 and (domain_j >> residue) & 1:
+            continue
+
+        # The residue is not valid anymore: searches a new support (the lowest other color of x_j)
+        n_checks += 1
+        others = domain_j & ~(1 << x)
+        if others:
+            residues[base + x] = (others & -others).bit_length() - 1
+        else:
+            domain_i &= ~(1 << x)
+
+    stats = state.get_stats()
+    stats.revisions += 1
+    stats.support_checks += n_checks
+
+    if domain_i != assignment[x_i]:
+        stats.ac_prunes += (assignment[x_i] & ~domain_i).bit_count()
+        reasons = state.get_reasons()
+        state.reduce(x_i, domain_i, reasons[x_i] | reasons[x_j])
+        return True
+
+    return False
+
 
-    return arcs
+# Inference procedure of each type of backtracking
+INFERENCES = {"ForwardChecking": forward_checking, "Mac": mac}
 
 
 def print_node_color(nodes, nxGraph, assignment, bt_type):
@@ -333,7 +1078,7 @@ def print_node_color(nodes, nxGraph, assignment, bt_type):
     if bt_type == "FC":
         ax.set_title("Backtracking with FC")
         for node in nodes:
-            if len(assignment[node.get_label()]) == 3:
+            if len(assignment[node.get_label()]) == len(COLORS):
                 colors[node.get_label()] = 'black'
             else:
                 colors[node.get_label()] = assignment[node.get_label()][0]
@@ -0,0 +1,95 @@
+import json
+import timeit
+import InstanceCache
+import Parallel
+
+
+def get_solver_options(solver):
+
+    """
+
+    Returns the keyword arguments of Graph.backtracking of a solver
+
+    :param solver: (String or dict) bt_type ("ForwardChecking", "Mac" or "MinConflicts") or dict of keyword arguments
+                   of Graph.backtracking
+    :return:       (dict) keyword arguments of Graph.backtracking
+
+    """
+
+    if isinstance(solver, str):
+        return {"bt_type": solver}
+
+    return dict(solver)
+
+
+def solve_instance(task):
+
+    """
+
+    Generates and solves one instance of a batch (run in a worker process)
+
+    :param task: (tuple) position of the instance in the batch, its spec (n_nodes, seed, solver) and the directory of
+                 the instance cache (None to always generate the graph)
+    :return:     (dict) result row: the spec, the size of the graph, True if it is colorable, the generation (or
+                 loading from the cache) and solving times in seconds and the statistics of the search
+
+    """
+
+    index, (n_nodes, seed, solver), cache_dir = task
+
+    start = timeit.default_timer()
+    graph = InstanceCache.get_instance(n_nodes, seed, cache_dir)
+    generation_time = timeit.default_timer() - start
+
+    start = timeit.default_timer()
+    result, stats = graph.backtracking(animate=False, return_stats=True, verbose=False, **get_solver_options(solver))
+    solve_time = timeit.default_timer() - start
+
+    return {"index": index, "n_nodes": n_nodes, "seed": seed, "solver": solver, "n_edges": len(graph.get_edges()),
+            "colorable": result is not False, "generation_time": generation_time, "solve_time": solve_time,
+            "stats": stats.to_dict()}
+
+
+def solve_batch(specs, workers=None, max_in_flight=None, cache_dir=InstanceCache.CACHE_DIR):
+
+    """
+
+    Solves a stream of instances on a pool of processes and returns the results as the instances finish. Each spec is
+    a tuple (n_nodes, seed, solver): the graph (n_nodes, seed) is generated in the worker and solved with the solver
+    (see get_solver_options). The graphs already generated are loaded from the instance cache (see
+    InstanceCache.get_instance). The specs are read lazily and only max_in_flight instances are submitted at a time, so
+    sweeps of any length run in constant memory.
+
+    :param specs:           (iterable) tuples (n_nodes, seed, solver)
+    :param workers:         (int) number of worker processes, None to use all the cores
+    :param max_in_flight:   (int) maximum number of instances submitted at a time, None for twice the workers
+    :param cache_dir:       (String) directory of the instance cache, None to always generate the graphs
+    :return:                (generator) result rows (see solve_instance) in order of completion; the "index" of a row
+                            is the position of its spec
+
+    """
+
+    tasks = ((index, spec, cache_dir) for index, spec in enumerate(specs))
+
+    return Parallel.imap_unordered(solve_instance, tasks, workers, max_in_flight)
+
+
+def write_jsonl(rows, path):
+
+    """
+
+    Writes the result rows to a JSON Lines file as they arrive (one JSON object per line)
+
+    :param rows: (iterable) result rows, e.g. returned by solve_batch
+    :param path: (String) path of the file
+    :return:     (int) number of rows written
+
+    """
+
+    n_rows = 0
+    with open(path, "w") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+            n_rows += 1
+
+    return n_rows
@@ -0,0 +1,132 @@
+import heapq
+import Backtracking as BT
+import Parallel
+
+
+def dsatur(compiled):
+
+    """
+
+    DSATUR greedy coloring: repeatedly colors the uncolored node with the most distinct colors among its neighbors
+    (saturation), ties broken by the highest degree, with the lowest color not used by its neighbors. The number of
+    colors used is an upper bound of the chromatic number.
+
+    :param compiled:    (CompiledGraph) integer-indexed structure of the graph
+    :return:            (list) index of the color of each node id
+
+    """
+
+    adjacency = compiled.get_adjacency()
+    degrees = compiled.get_degrees().tolist()
+    colors = [-1] * compiled.get_n_nodes()
+    saturation = [0] * compiled.get_n_nodes()     # Bitmask of the colors of the neighbors of each node
+
+    # Heap of tuples (-saturation, -degree, node id); entries with an outdated saturation are skipped
+    heap = [(0, -degree, node) for node, degree in enumerate(degrees)]
+    heapq.heapify(heap)
+
+    while heap:
+        neg_saturation, _, node = heapq.heappop(heap)
+        if colors[node] >= 0 or -neg_saturation != saturation[node].bit_count():
+            continue
+
+        free = ~saturation[node]
+        color = (free & -free).bit_length() - 1
+        colors[node] = color
+
+        for neighbor in adjacency[node]:
+            if colors[neighbor] < 0 and not (saturation[neighbor] >> color) & 1:
+                saturation[neighbor] |= 1 << color
+                heapq.heappush(heap, (-saturation[neighbor].bit_count(), -degrees[neighbor], neighbor))
+
+    return colors
+
+
+def greedy_clique(compiled):
+
+    """
+
+    Finds a clique greedily: starting from each node, its neighbors are added in descending order of degree when they
+    are adjacent to all the nodes already in the clique. The size of the clique is a lower bound of the chromatic
+    number.
+
+    :param compiled:    (CompiledGraph) integer-indexed structure of the graph
+    :return:            (list) ids of the nodes of the largest clique found
+
+    """
+
+    adjacency = compiled.get_adjacency()
+    degrees = compiled.get_degrees().tolist()
+    neighbor_sets = [set(neighbors) for neighbors in adjacency]
+    best = []
+
+    for start in sorted(range(compiled.get_n_nodes()), key=lambda node: -degrees[node]):
+        if degrees[start] < len(best):     # A clique containing start cannot be larger than the best one
+            break
+
+        clique = [start]
+        for candidate in sorted(adjacency[start], key=lambda node: -degrees[node]):
+            if all(candidate in neighbor_sets[member] for member in clique):
+                clique.append(candidate)
+
+        if len(clique) > len(best):
+            best = clique
+
+    return best
+
+
+def solve_n_colors(compiled, n_colors, config, hints=None, stats=None):
+
+    """
+
+    Runs the backtracking search with a palette of n_colors colors
+
+    :param compiled:    (CompiledGraph) integer-indexed structure of the graph
+    :param n_colors:    (int) number of colors
+    :param config:      (dict) solver options (see Parallel.solve_config)
+    :param hints:       (list) color to be tried first for each node id (-1 for none), None if there are no hints
+    :param stats:       (SearchStats) if given, it is filled with the statistics of the search
+    :return:            (list) index of the color of each node id, False if there is no solution
+
+    """
+
+    domains = [BT.get_full_domain(n_colors)] * compiled.get_n_nodes()
+    result = Parallel.solve_config(compiled, domains, config, stats, hints=hints)
+    if result is False:
+        return False
+
+    return [domain.bit_length() - 1 for domain in result]
+
+
+def chromatic_number(compiled, config=None, stats=None):
+
+    """
+
+    Finds the minimum number of colors of the graph. DSATUR gives the starting coloring (upper bound) and a greedy
+    clique the lower bound; then the backtracking search is run with one color less than the best coloring found,
+    until it fails or the lower bound is reached. Each search is warm started with the previous coloring as value
+    hints, so most nodes keep their color.
+
+    :param compiled:    (CompiledGraph) integer-indexed structure of the graph
+    :param config:      (dict) solver options (see solve_n_colors), MAC by default
+    :param stats:       (SearchStats) if given, it is filled with the statistics of all the searches
+    :return:            (tuple) the chromatic number and the index of the color of each node id in an optimal coloring
+
+    """
+
+    config = {"bt_type": "Mac"} if config is None else config
+    if compiled.get_n_nodes() == 0:
+        return 0, []
+
+    best = dsatur(compiled)
+    upper = max(best) + 1
+    lower = len(greedy_clique(compiled))
+
+    while upper > lower:
+        coloring = solve_n_colors(compiled, upper - 1, config, best, stats)
+        if coloring is False:
+            break
+        best = coloring
+        upper = max(best) + 1
+
+    return upper, best
@@ -0,0 +1,139 @@
+import numpy as np
+
+
+class CompiledGraph:
+    """
+
+    Immutable, integer-indexed representation of the graph used by the backtracking solver (CSR format). The nodes
+    are numbered with contiguous ids 0..n-1 and the neighbors of node i are neighbors[offsets[i]:offsets[i + 1]].
+
+    Attributes:
+        self._labels        (list) Label of each node (the id of a node is its index)
+        self._ids           (dict) Dict containing key: node label, value: node id
+        self._offsets       (numpy array) Offsets of the neighbors of each node in self._neighbors (length n + 1)
+        self._neighbors     (numpy array) Ids of the neighbors of every node, stored contiguously (length 2 * n_edges)
+        self._degrees       (numpy array) Degree of each node
+        self._adjacency     (tuple) Tuple of the neighbor ids of each node, used by the pure Python search loops
+        self._arc_offsets   (tuple) Same values of self._offsets as Python ints: arcs of node i are arc_offsets[i]..[i + 1]
+        self._arc_sources   (tuple) Source node of each arc: arc k goes from arc_sources[k] to neighbors[k]
+        self._arc_targets   (tuple) Target node of each arc (same values of self._neighbors as Python ints)
+        self._reverse_arcs  (tuple) Id of the reverse arc of each arc (arc k = (i, j) --> reverse_arcs[k] = (j, i))
+
+    """
+
+    def __init__(self, labels, edges):
+
+        """
+
+        Builds the compiled graph from the node labels and the list of edges. The neighbors of each node are stored in
+        the same order of the edges.
+
+        :param labels: (list) Label of each node
+        :param edges:  (list) List of tuples (node id, node id)
+
+        """
+
+        self._labels = list(labels)
+        self._ids = {label: node_id for node_id, label in enumerate(self._labels)}
+
+        adjacency = [[] for _ in self._labels]
+        for u, v in edges:
+            adjacency[u].append(v)
+            adjacency[v].append(u)
+
+        self._degrees = np.array([len(neighbors) for neighbors in adjacency], dtype=np.int64)
+        self._offsets = np.zeros(len(self._labels) + 1, dtype=np.int64)
+        np.cumsum(self._degrees, out=self._offsets[1:])
+        self._neighbors = np.array([v for neighbors in adjacency for v in neighbors], dtype=np.int64)
+        self._adjacency = tuple(tuple(neighbors) for neighbors in adjacency)
+        self._arc_offsets = tuple(self._offsets.tolist())
+        self._arc_sources = tuple(u for u, neighbors in enumerate(adjacency) for _ in neighbors)
+
+        self._arc_targets = tuple(self._neighbors.tolist())
+
+        # The reverse of arc (u, v) is the position of u among the neighbors of v
+        arc_ids = {(u, v): arc for arc, (u, v) in enumerate(zip(self._arc_sources, self._arc_targets))}
+        self._reverse_arcs = tuple(arc_ids[(v, u)] for u, v in arc_ids)
+
+        for array in (self._degrees, self._offsets, self._neighbors):
+            array.flags.writeable = False
+
+    def get_n_nodes(self):
+        return len(self._labels)
+
+    def get_labels(self):
+        return self._labels
+
+    def get_id(self, label):
+        return self._ids[label]
+
+    def get_offsets(self):
+        return self._offsets
+
+    def get_neighbors_array(self):
+        return self._neighbors
+
+    def get_degrees(self):
+        return self._degrees
+
+    def get_adjacency(self):
+        return self._adjacency
+
+    def get_neighbors(self, node_id):
+        return self._adjacency[node_id]
+
+    def get_n_arcs(self):
+        return len(self._arc_sources)
+
+    def get_arc_sources(self):
+        return self._arc_sources
+
+    def get_arc_targets(self):
+        return self._arc_targets
+
+    def get_reverse_arcs(self):
+        return self._reverse_arcs
+
+    def get_arcs(self, node_id):
+
+        """
+
+        Returns the ids of the arcs going out of the given node (in the same order of its neighbors)
+
+        :param node_id: (int) id of the node
+        :return:        (range) ids of the arcs (node_id, neighbor)
+
+        """
+
+        return range(self._arc_offsets[node_id], self._arc_offsets[node_id + 1])
+
+    def subgraph(self, node_ids):
+
+        """
+
+        Returns the subgraph induced by the given nodes. The node with id i in the subgraph is node_ids[i] in this
+        graph (and has the same label).
+
+        :param node_ids: (list) ids of the nodes of the subgraph
+        :return:         (CompiledGraph) the induced subgraph
+
+        """
+
+        positions = {node_id: i for i, node_id in enumerate(node_ids)}
+        edges = [(i, positions[neighbor]) for i, node_id in enumerate(node_ids)
+                 for neighbor in self._adjacency[node_id] if neighbor in positions and node_id < neighbor]
+
+        return CompiledGraph([self._labels[node_id] for node_id in node_ids], edges)
+
+    def to_label_dict(self, values):
+
+        """
+
+        Converts a list indexed by node id into a dictionary indexed by node label
+
+        :param values: (list) One value for each node id
+        :return:       (dict) dictionary {node label: value}
+
+        """
+
+        return {label: values[node_id] for node_id, label in enumerate(self._labels)}
@@ -1,34 +1,64 @@
 import math
 import random
 import networkx as nx
+import numpy as np
 import matplotlib.pyplot as plt
 import Intersections as intx
+import LocalSearch
 import Backtracking as BT
+import Chromatic
+import CompiledGraph
+import Parallel
+import Preprocessing
+import Repair
+import SpatialIndex
 
 # Indicates the pause between each edge generation of the graph
 PAUSE = 0.5
 
 
-def create_random_nodes(n_nodes):
+def create_random_nodes(n_nodes, rng=random):
     """
 
     Creates n_nodes Node class instances with random x,y coordinates.
 
     :param: (int) Number of nodes
+    :param rng: (random.Random) random generator used for the coordinates (the global one by default)
     :return: (list) list of Node class instances
 
     """
 
     nodes = []
     for i in range(n_nodes):
-        x = random.randint(1, 100)
-        y = random.randint(1, 100)
+        x = rng.randint(1, 100)
+        y = rng.randint(1, 100)
         label = str(i)
         nodes.append(Node(label, x, y))
 
     return nodes
 
 
+def from_arrays(coords, edges, seed=None):
+    """
+
+    Builds the graph from its compact representation (see to_arrays), e.g. an instance loaded from the cache
+    (see InstanceCache.py). The edges are rebuilt in the same order, so the graph is identical to the one saved.
+
+    :param coords: (numpy array) Array of shape (N, 2) with the x, y coordinates of each node
+    :param edges:  (numpy array) Array of shape (M, 2) with the ids (positions in coords) of the nodes of each edge
+    :param seed:   (int) Seed of the random generator of the graph
+    :return:       (Graph)
+
+    """
+
+    nodes = [Node(str(i), x, y) for i, (x, y) in enumerate(np.asarray(coords).tolist())]
+    graph = Graph(len(nodes), seed, nodes)
+    for u, v in np.asarray(edges).tolist():
+        graph.build_edge(nodes[u], nodes[v])
+
+    return graph
+
+
 class Node:
     """
 
@@ -64,14 +94,21 @@ class Graph:
     Attributes:
         self._n_nodes   (int) Number of graph nodes
         self._nodes     (list) List of Node class instances
-        self._edges     (list) List of graph edges
+        self._edges     (list) List of graph edges (in order of generation; a removed edge is replaced by the last one)
+        self._adjacency (dict) Dict containing key: node label, value: dict {neighbor label: edge index in self._edges}
         self._animate   (bool) True if shows the graph animation, False otherwise
         self._points    (dict) Dict containing the coordinates of each node
         self._graph     (networkx Graph) Stores the networkx Graph information
+        self._edge_index (EdgeGrid) Spatial index of the edges used to find the candidate intersections
+        self._node_index (PointGrid) Spatial index of the nodes used to find the nearest nodes
+        self._compiled  (CompiledGraph) Cached integer-indexed structure of the graph used by the solver
+        self._random    (random.Random) Random generator of the graph (seeded if a seed is given)
+        self._touched   (dict) Labels of the nodes added or linked to a new neighbor since the last recolor (as keys,
+                        in order of edit)
 
     """
 
-    def __init__(self, n_nodes):
+    def __init__(self, n_nodes, seed=None, nodes=None):
 
         """
 
@@ -79,14 +116,25 @@ class Graph:
         graph generation
 
         :param n_nodes      (int) Number of nodes
+        :param seed         (int) Seed of the random generator of the graph: the same (n_nodes, seed) always gives the
+                            same nodes and starting node. If None, the global random generator is used
+        :param nodes        (list) Node class instances of the graph (labelled "0", "1", ...), None to create n_nodes
+                            random nodes
 
         """
 
+        self._random = random.Random(seed) if seed is not None else random
         self._n_nodes = n_nodes
-        self._nodes = create_random_nodes(self._n_nodes)
+        self._nodes = create_random_nodes(self._n_nodes, self._random) if nodes is None else nodes
         self._edges = []
+        self._adjacency = {node.get_label(): {} for node in self._nodes}
         self._points = self.get_node_coords()
         self._graph = nx.Graph()
+        self._edge_index = SpatialIndex.EdgeGrid(self.get_cell_size())
+        self._node_index = SpatialIndex.PointGrid([self._points[node.get_label()] for node in self._nodes],
+                                                  self.get_cell_size())
+        self._compiled = None
+        self._touched = {}
 
         for node in self._nodes:
             pos_x = node.get_x()
@@ -96,6 +144,23 @@ class Graph:
         pos = self.get_node_coords()
         nx.set_node_attributes(self._graph, pos, 'coord')
 
+    def to_arrays(self):
+
+        """
+
+        Returns the compact representation of the graph: the coordinates of the nodes and the edges as arrays of node
+        ids (positions in the list of the nodes), in order of generation
+
+        :return: (tuple) Array of shape (N, 2) of the x, y coordinates and array of shape (M, 2) of the edges
+
+        """
+
+        ids = {node.get_label(): node_id for node_id, node in enumerate(self._nodes)}
+        coords = np.array([(node.get_x(), node.get_y()) for node in self._nodes], dtype=np.int32).reshape(-1, 2)
+        edges = np.array([(ids[u], ids[v]) for u, v in self._edges], dtype=np.int32).reshape(-1, 2)
+
+        return coords, edges
+
     def get_status(self, current_node, nearest_node):
 
         """
@@ -121,7 +186,7 @@ class Graph:
 
         """
 
-        return random.choice(self._nodes)
+        return self._random.choice(self._nodes)
 
     def check_edge(self, node1, node2):
 
@@ -135,13 +200,32 @@ class Graph:
 
         """
 
-        edge1 = tuple((node1.get_label(), node2.get_label()))
-        edge2 = tuple((node2.get_label(), node1.get_label()))
+        return node2.get_label() in self._adjacency[node1.get_label()]
 
-        if edge1 in self._edges or edge2 in self._edges:
-            return True
-        else:
-            return False
+    def get_edges(self):
+
+        """
+
+        Returns the edges of the graph in the order they were generated
+
+        :return: (list) List of tuples (node label, node label)
+
+        """
+
+        return self._edges
+
+    def get_neighbors(self, label):
+
+        """
+
+        Returns the neighbors of the node with the given label (in order of edge generation)
+
+        :param label: (String) label of the node
+        :return:      (dict_keys) labels of the neighbors
+
+        """
+
+        return self._adjacency[label].keys()
 
     def find_nearest_node(self, input_node):
 
@@ -155,27 +239,30 @@ class Graph:
 
         """
 
-        node_distance = {}
-        for node in self._nodes:
-            if input_node != node:
-                if not self.check_edge(input_node, node):  # if there is already an edge skip
-                    node_distance[node.get_label()] = math.dist((input_node.get_x(), input_node.get_y()),
-                                                                (node.get_x(), node.get_y()))
+        distance_ordered_nodes = list(self.iter_nearest_nodes(input_node))
 
-        if len(node_distance) == 0:  # if there are no edges left return None --> ends generate_edges recursion
+        if len(distance_ordered_nodes) == 0:  # if there are no edges left return None --> ends the edge generation
             return None
 
-        sorted_node_distances = sorted(node_distance, key=node_distance.get)
+        return distance_ordered_nodes
 
-        # a list containing the nearest nodes to input_node sorted by distance
-        distance_ordered_nodes = []
+    def iter_nearest_nodes(self, input_node):
 
-        for x in sorted_node_distances:
-            for node in self._nodes:
-                if x == node.get_label():
-                    distance_ordered_nodes.append(node)
+        """
 
-        return distance_ordered_nodes
+        Lazy version of find_nearest_node: the nodes not linked to input_node are returned one at a time in ascending
+        order of distance (using the spatial index of the nodes), so only the nodes actually needed are visited
+
+        :param input_node: (Node)
+        :return:           (generator) nearest nodes from input_node
+
+        """
+
+        for node_id in self._node_index.iter_nearest(self._points[input_node.get_label()]):
+            node = self._nodes[node_id]
+            if input_node != node:
+                if not self.check_edge(input_node, node):  # if there is already an edge skip
+                    yield node
 
     def get_node_coords(self):
 
@@ -193,6 +280,28 @@ class Graph:
 
         return node_coords
 
+    def get_cell_size(self):
+
+        """
+
+        Computes the side of the cells of the edge spatial index, so that each cell contains about one node on average
+
+        :return: (float) Side of each cell
+
+        """
+
+        if not self._points:
+            return 1
+
+        xs = [coords[0] for coords in self._points.values()]
+        ys = [coords[1] for coords in self._points.values()]
+        span = max(max(xs) - min(xs), max(ys) - min(ys))
+
+        if span == 0:
+            return 1
+
+        return span / math.ceil(math.sqrt(len(self._points)))
+
     def get_node_from_coords(self, coords):
 
         """
@@ -219,13 +328,101 @@ class Graph:
 
         """
 
-        # Add edge to networkx Graph and to self._edges attribute
+        # Add edge to networkx Graph, to self._edges and to the adjacency index
         if node1 is not node2:
             self._graph.add_edge(node1.get_label(), node2.get_label())
             edge = tuple((node1.get_label(), node2.get_label()))
 
-            if edge not in self._edges:
-                self._edges.append((node1.get_label(), node2.get_label()))
+            if not self.check_edge(node1, node2):
+                self._adjacency[edge[0]][edge[1]] = len(self._edges)
+                self._adjacency[edge[1]][edge[0]] = len(self._edges)
+                self._edges.append(edge)
+                self._edge_index.insert(edge, self._points[edge[0]], self._points[edge[1]])
+                self._compiled = None
+
+    def add_node(self, x, y):
+
+        """
+
+        Adds a new node (without edges) to the graph
+
+        :param x: (int) x coordinate of the node
+        :param y: (int) y coordinate of the node
+        :return: (Node) the new node
+
+        """
+
+        node = Node(str(len(self._nodes)), x, y)
+        self._nodes.append(node)
+        self._n_nodes += 1
+        self._adjacency[node.get_label()] = {}
+        self._points[node.get_label()] = (x, y)
+        self._node_index.insert((x, y))
+        self._graph.add_node(node.get_label(), pos=(x, y), coord=(x, y))
+        self._touched[node.get_label()] = None
+        self._compiled = None
+
+        return node
+
+    def add_edge(self, node1, node2):
+
+        """
+
+        Adds an edge between node1 and node2 (edit of an existing graph): the two nodes are checked by the next recolor
+
+        :param node1: (Node)
+        :param node2: (Node)
+
+        """
+
+        self.build_edge(node1, node2)
+        self._touched[node1.get_label()] = None
+        self._touched[node2.get_label()] = None
+
+    def remove_edge(self, node1, node2):
+
+        """
+
+        Removes the edge between node1 and node2, if there is one. The last edge of self._edges takes its place.
+
+        :param node1: (Node)
+        :param node2: (Node)
+
+        """
+
+        if not self.check_edge(node1, node2):
+            return
+
+        index = self._adjacency[node1.get_label()].pop(node2.get_label())
+        del self._adjacency[node2.get_label()][node1.get_label()]
+
+        last = self._edges.pop()
+        if index < len(self._edges):
+            self._edges[index] = last
+            self._adjacency[last[0]][last[1]] = index
+            self._adjacency[last[1]][last[0]] = index
+
+        self._edge_index.remove(index)
+        self._graph.remove_edge(node1.get_label(), node2.get_label())
+        self._compiled = None
+
+    def compile(self):
+
+        """
+
+        Returns the integer-indexed (CSR) structure of the graph used by the solver. It is built only once and cached
+        until a new edge is added.
+
+        :return: (CompiledGraph)
+
+        """
+
+        if self._compiled is None:
+            labels = list(self._adjacency)
+            ids = {label: node_id for node_id, label in enumerate(labels)}
+            self._compiled = CompiledGraph.CompiledGraph(labels, [(ids[u], ids[v]) for u, v in self._edges])
+
+        return self._compiled
 
     def do_lines_intersect(self, a1, a2, b1, b2):
 
@@ -256,75 +453,242 @@ class Graph:
 
         return False
 
+    def do_lines_intersect_bulk(self, a1, a2, segments):
+
+        """
+
+        Check if the line generated by a1-a2 intersects each one of the given lines (vectorized do_lines_intersect)
+
+        :param a1:       (tuple) Starting node coordinates of the line
+        :param a2:       (tuple) Ending node coordinates of the line
+        :param segments: (numpy array) Array of shape (N, 4) with the x1, y1, x2, y2 coordinates of the other lines
+        :return:         (numpy array) Boolean array, True where the two lines intersect
+
+        """
+
+        return intx.do_lines_intersect_batch(a1, a2, segments)
+
     def generate_edges(self, central_node):
 
         """
 
         Generates the edges of the graph starting from central_node and finding the nearest node to it
-        (first element of the list of the nearest nodes). Then recursively applies the function to the new central_node
+        (first element of the list of the nearest nodes). Then the same step is applied to the new central_node
         until there are no more connections left in the graph
 
         :param central_node (Node) the starting node for the generation of the edges
 
         """
 
-        distance_ordered_nodes = self.find_nearest_node(central_node)
+        for _ in self.iter_edges(central_node):
+            pass
 
-        if distance_ordered_nodes is None:  # No other nodes available
-            return
-
-        if len(self._edges) < 2:  # No need to check for intersections
-            self.build_edge(central_node, distance_ordered_nodes[0])
-            self.get_status(central_node, distance_ordered_nodes[0])
+    def iter_edges(self, central_node):
 
-            return self.generate_edges(distance_ordered_nodes[0])
+        """
 
-        for node, _ in enumerate(distance_ordered_nodes):
-            if distance_ordered_nodes[node] is not None:
-                if not self.check_edge(central_node, distance_ordered_nodes[node]):
-                    if not any(self.do_lines_intersect(self._points[distance_ordered_nodes[node].get_label()],
-                                                       self._points[central_node.get_label()], self._points[u],
-                                                       self._points[v]) for u, v in self._edges):
+        Iterative (non-recursive) engine of generate_edges: each new edge is built and then yielded, so the edges can be
+        processed while they are produced. At each step the new edge links central_node to the nearest node that does
+        not make the edge cross the existing ones; the reached node becomes the next central_node.
 
-                        self.build_edge(central_node, distance_ordered_nodes[node])
-                        self.get_status(central_node, distance_ordered_nodes[node])
+        :param central_node: (Node) the starting node for the generation of the edges
+        :return:             (generator) labels (u, v) of each generated edge
 
-                        return self.generate_edges(distance_ordered_nodes[node])
+        """
 
-                    else:
-                        continue  # Found intersection!
+        while True:
+            distance_ordered_nodes = self.iter_nearest_nodes(central_node)
+            nearest_node = None
 
-                else:
-                    continue  # There is already an edge between central_node and nearest node
+            if len(self._edges) < 2:  # No need to check for intersections
+                nearest_node = next(distance_ordered_nodes, None)
 
             else:
+                for node in distance_ordered_nodes:
+                    a1 = self._points[node.get_label()]
+                    a2 = self._points[central_node.get_label()]
+
+                    # Only the edges near the new one (found with the spatial index) can intersect it
+                    if not self.do_lines_intersect_bulk(a1, a2, self._edge_index.query_segments(a1, a2)).any():
+                        nearest_node = node
+                        break
+
+            if nearest_node is None:  # No other nodes available or every available edge crosses an existing one
                 return
 
-    def backtracking(self, bt_type, animate):
+            self.build_edge(central_node, nearest_node)
+            self.get_status(central_node, nearest_node)
+
+            yield central_node.get_label(), nearest_node.get_label()
+
+            central_node = nearest_node
+
+    def backtracking(self, bt_type, animate, propagator="AC3", return_stats=False, verbose=True,
+                     max_nogoods=BT.NOGOOD_CAPACITY, symmetry_breaking=True, preprocess=False):
 
         """
 
-        Backtracking algorithm to find the graph-colouring solution in two different ways (FC/MAC)
+        Backtracking algorithm to find the graph-colouring solution in two different ways (FC/MAC), or min-conflicts
+        local search (MinConflicts)
 
         :param animate: (Bool) If True, it shows the backtracking colors animation
+        :param bt_type: (String) "ForwardChecking", "Mac" or "MinConflicts" (local search: it cannot prove that there is
+                        no solution, False means that none was found within LocalSearch.MAX_STEPS moves)
+        :param propagator: (String) revise procedure used by MAC: "AC3" or "Residual"
+        :param return_stats: (Bool) If True, the statistics of the search (SearchStats) are returned with the solution
+        :param verbose: (Bool) If True, the final assignment is printed
+        :param max_nogoods: (int) Size of the store of the nogoods learned by backjumping, 0 to disable it
+        :param symmetry_breaking: (Bool) If True, only one of the colors not used yet is tried for each node
+        :param preprocess: (Bool) If True, the graph is reduced before the search (see Preprocessing.solve): the nodes
+                           with less neighbors than colors are peeled and the biconnected blocks are solved separately.
+                           The animation is not available in this case
+        :return: (dict) the color assignment {node: [color]}, False if there is no solution. If return_stats is True,
+                 a tuple (assignment, SearchStats)
+
+        """
+
+        compiled = self.compile()
+        stats = BT.SearchStats()
+
+        # The initial assignment consists of all the available colors (full bitmask domain) assigned to all nodes
+        palette = BT.get_palette()
+        initial_assignment = [BT.get_full_domain(len(palette))] * compiled.get_n_nodes()
+
+        if preprocess and bt_type in BT.INFERENCES:
+            config = {"bt_type": bt_type, "propagator": propagator, "max_nogoods": max_nogoods,
+                      "symmetry_breaking": symmetry_breaking}
+            result = Preprocessing.solve(compiled, len(palette), config, stats=stats)
+            if result is not False:
+                result = [1 << color for color in result]
+                if verbose:
+                    print("FC: " if bt_type == "ForwardChecking" else "MAC:",
+                          compiled.to_label_dict(BT.decode_assignment(result, palette)))
+        elif bt_type == "MinConflicts":
+            result = LocalSearch.min_conflicts(compiled, initial_assignment, stats=stats)
+            if result is not False and verbose:
+                print("MinConflicts:", compiled.to_label_dict(BT.decode_assignment(result, palette)))
+        elif bt_type == "ForwardChecking":
+            result = BT.backtrack_fc(compiled, initial_assignment, self._nodes, self._graph, animate, stats, verbose,
+                                     max_nogoods, symmetry_breaking)
+        elif bt_type == "Mac":
+            result = BT.backtrack_mac(compiled, initial_assignment, self._nodes, self._graph, animate, propagator,
+                                      stats, verbose, max_nogoods, symmetry_breaking)
+        else:
+            return None
+
+        if result is not False:
+            result = compiled.to_label_dict(BT.decode_assignment(result, palette))
+
+        if return_stats:
+            return result, stats
+
+        return result
+
+    def chromatic_number(self, bt_type="Mac", propagator="AC3", return_stats=False, verbose=True):
+
+        """
+
+        Finds the minimum number of colors needed to color the graph, with the palette extended beyond COLORS if needed
+
         :param bt_type: (String) "ForwardChecking" or "Mac"
+        :param propagator: (String) revise procedure used by MAC: "AC3" or "Residual"
+        :param return_stats: (Bool) If True, the statistics of the searches (SearchStats) are returned too
+        :param verbose: (Bool) If True, the chromatic number and the coloring are printed
+        :return: (tuple) the chromatic number and an optimal color assignment {node: [color]}. If return_stats is
+                 True, a tuple (chromatic number, assignment, SearchStats)
 
         """
 
-        # Initialize the graph dict: {node: [neighbors]}
-        graph = {}
-        for node, neighbor in self._graph.adjacency():
-            graph[node] = list(neighbor.keys())
+        compiled = self.compile()
+        stats = BT.SearchStats()
 
-        # The initial assignment consists of all the available colors assigned to all nodes
-        initial_assignment = {}
-        for node in graph:
-            initial_assignment[node] = list(BT.COLORS)
+        n_colors, colors = Chromatic.chromatic_number(compiled, {"bt_type": bt_type, "propagator": propagator}, stats)
+        palette = BT.get_palette(n_colors)
+        result = compiled.to_label_dict([[palette[color]] for color in colors])
 
-        if bt_type == "ForwardChecking":
-            return BT.backtrack_fc(self._graph, graph, initial_assignment, self._nodes, animate)
-        elif bt_type == "Mac":
-            return BT.backtrack_mac(self._graph, graph, initial_assignment, self._nodes, animate)
+        if verbose:
+            print("Chromatic number:", n_colors, result)
+
+        if return_stats:
+            return n_colors, result, stats
+
+        return n_colors, result
+
+    def recolor(self, assignment, bt_type="Mac", propagator="AC3", max_radius=Repair.MAX_RADIUS):
+
+        """
+
+        Repairs the coloring of the graph after some edits (add_node, add_edge, remove_edge). The previous coloring is
+        kept and only the conflicts introduced by the edits are repaired, recoloring the nodes near them (see
+        Repair.repair); the full backtracking search is run only if the local repair fails.
+
+        :param assignment: (dict) the color assignment {node: [color]} valid before the edits
+        :param bt_type: (String) "ForwardChecking" or "Mac"
+        :param propagator: (String) revise procedure used by MAC: "AC3" or "Residual"
+        :param max_radius: (int) Maximum radius (in edges) of the neighborhood recolored by the local repair
+        :return: (dict) the new color assignment {node: [color]}, False if there is no solution
+
+        """
+
+        config = {"bt_type": bt_type, "propagator": propagator}
+        result = Repair.repair(self._adjacency, assignment, self._touched, BT.get_palette(), config, max_radius)
+        self._touched = {}
+
+        if result is None:
+            result = self.backtracking(bt_type, False, propagator, verbose=False)
+
+        return result
+
+    def portfolio(self, configs=None, timeout=None):
+
+        """
+
+        Portfolio solving: races several solver configurations (FC, MAC and heuristic variants) in separate processes
+        and returns the first complete coloring or the first proof that there is none, cancelling the other ones
+
+        :param configs: (dict) solver configurations {name: options}, Parallel.PORTFOLIO by default
+        :param timeout: (float) seconds to wait for an answer, None to wait until the first one
+        :return: (tuple) the color assignment {node: [color]} (False if there is no solution, None on timeout) and
+                 the name of the configuration that answered first
+
+        """
+
+        compiled = self.compile()
+        palette = BT.get_palette()
+        initial_assignment = [BT.get_full_domain(len(palette))] * compiled.get_n_nodes()
+
+        result, name = Parallel.portfolio(compiled, initial_assignment, configs, timeout)
+
+        if result:
+            result = compiled.to_label_dict(BT.decode_assignment(result, palette))
+
+        return result, name
+
+    def parallel_backtracking(self, bt_type, workers=None, propagator="AC3"):
+
+        """
+
+        Parallel version of backtracking: the top of the search tree is split into independent subproblems solved by
+        a pool of processes, and the first solution found stops all of them
+
+        :param bt_type: (String) "ForwardChecking" or "Mac"
+        :param workers: (int) Number of worker processes, None to use all the cores
+        :param propagator: (String) revise procedure used by MAC: "AC3" or "Residual"
+        :return: (dict) the color assignment {node: [color]}, False if there is no solution
+
+        """
+
+        compiled = self.compile()
+        palette = BT.get_palette()
+        initial_assignment = [BT.get_full_domain(len(palette))] * compiled.get_n_nodes()
+
+        result = Parallel.parallel_search(compiled, initial_assignment, {"bt_type": bt_type, "propagator": propagator},
+                                          workers)
+
+        if result is not False:
+            result = compiled.to_label_dict(BT.decode_assignment(result, palette))
+
+        return result
 
     def visualize(self):
 
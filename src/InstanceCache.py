@@ -0,0 +1,175 @@
+import os
+import numpy as np
+import Graph
+
+# Directory of the cached instances (in the project root)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "instances")
+
+# Maximum total size in bytes of the cached instances: the least recently used ones are removed beyond it
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+# Version of the file format (and of the graph generator): files of another version are regenerated
+FORMAT_VERSION = 1
+
+
+def get_path(n_nodes, seed, cache_dir=CACHE_DIR):
+
+    """
+
+    Returns the path of the file of the instance (n_nodes, seed)
+
+    :param n_nodes:     (int) Number of nodes
+    :param seed:        (int) Seed of the graph
+    :param cache_dir:   (String) directory of the cache
+    :return:            (String) path of the file
+
+    """
+
+    return os.path.join(cache_dir, f"{n_nodes}_{seed}.npy")
+
+
+def save(graph, path):
+
+    """
+
+    Writes the graph to a flat binary file: a single int32 array (.npy) holding the format version, the number of
+    nodes and of edges, the x, y coordinates of the nodes and the node ids of the edges. The file is written under a
+    temporary name and then renamed, so processes reading the cache at the same time never see a partial file.
+
+    :param graph:   (Graph) graph to be saved
+    :param path:    (String) path of the file
+
+    """
+
+    coords, edges = graph.to_arrays()
+    data = np.concatenate(([FORMAT_VERSION, len(coords), len(edges)], coords.ravel(), edges.ravel())).astype(np.int32)
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        np.save(f, data)
+    os.replace(temp_path, path)
+
+
+def load(path, seed=None):
+
+    """
+
+    Reads a graph written by save. The file is memory-mapped, so only the pages actually read are loaded.
+
+    :param path:    (String) path of the file
+    :param seed:    (int) Seed of the random generator of the graph
+    :return:        (Graph) the graph, None if the file was written with another format version
+
+    """
+
+    data = np.load(path, mmap_mode="r")
+    if len(data) < 3 or data[0] != FORMAT_VERSION:
+        return None
+
+    n_nodes, n_edges = int(data[1]), int(data[2])
+    coords = data[3:3 + 2 * n_nodes].reshape(-1, 2)
+    edges = data[3 + 2 * n_nodes:3 + 2 * n_nodes + 2 * n_edges].reshape(-1, 2)
+
+    return Graph.from_arrays(coords, edges, seed)
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES, keep=None):
+
+    """
+
+    Removes the least recently used instances (oldest modification time) until the cache takes at most max_bytes
+
+    :param cache_dir:   (String) directory of the cache
+    :param max_bytes:   (int) maximum total size in bytes of the cached instances
+    :param keep:        (String) path of a file that must not be removed (e.g. the one just written)
+    :return:            (int) number of files removed
+
+    """
+
+    files = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".npy"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:     # Removed by another process
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        total -= size
+
+    return removed
+
+
+def get_instance(n_nodes, seed, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+
+    """
+
+    Returns the graph identified by (n_nodes, seed) with its edges generated. It is loaded from the cache if it was
+    already generated, otherwise it is generated and saved, removing the least recently used instances if the cache
+    grows beyond max_bytes. The graph is the same in both cases (nodes, edges and order of the edges).
+
+    If the graph generator changes, the cache has to be cleared (or FORMAT_VERSION increased).
+
+    :param n_nodes:     (int) Number of nodes
+    :param seed:        (int) Seed of the graph (None for an unseeded graph, which is never cached)
+    :param cache_dir:   (String) directory of the cache, None to always generate the graph
+    :param max_bytes:   (int) maximum total size in bytes of the cached instances
+    :return:            (Graph)
+
+    """
+
+    if cache_dir is None or seed is None:
+        graph = Graph.Graph(n_nodes, seed)
+        graph.generate_edges(graph.get_random_node())
+        return graph
+
+    path = get_path(n_nodes, seed, cache_dir)
+    if os.path.exists(path):
+        try:
+            graph = load(path, seed)
+        except (OSError, ValueError):     # Removed by another process or corrupted
+            graph = None
+        if graph is not None:
+            try:
+                os.utime(path)     # The modification time marks the last use
+            except FileNotFoundError:
+                pass
+            return graph
+
+    graph = Graph.Graph(n_nodes, seed)
+    graph.generate_edges(graph.get_random_node())
+
+    os.makedirs(cache_dir, exist_ok=True)
+    save(graph, path)
+    evict(cache_dir, max_bytes, keep=path)
+
+    return graph
+
+
+def clear(cache_dir=CACHE_DIR):
+
+    """
+
+    Removes all the cached instances
+
+    :param cache_dir:   (String) directory of the cache
+    :return:            (int) number of files removed
+
+    """
+
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    return evict(cache_dir, 0)
@@ -1,6 +1,8 @@
 # ---------- Taken from https://martin-thoma.com/how-to-check-if-two-line-segments-intersect/#Where_do_two_line_segments_intersect ---------#
 
 
+import numpy as np
+
 # A small value used to handle floating-point arithmetic errors
 EPSILON = 1e-9
 
@@ -112,4 +114,43 @@ def cross_product(u, v):
 
     return u[0] * v[1] - u[1] * v[0]
 
+
+def do_lines_intersect_batch(a1, a2, segments):
+
+    """
+
+    Vectorized version of the intersection check: tests the segment a1-a2 against N segments in one pass. It applies
+    the same steps of the single check (shared endpoint exclusion, bounding boxes rejection and the two orientation
+    tests) on whole arrays.
+
+    :param a1:       (tuple) Starting point coordinates of the segment
+    :param a2:       (tuple) Ending point coordinates of the segment
+    :param segments: (numpy array) Array of shape (N, 4) containing the x1, y1, x2, y2 coordinates of each segment
+    :return:         (numpy array) Boolean array of shape (N,), True where the segment a1-a2 intersects the segment
+
+    """
+
+    segments = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+    b1x, b1y, b2x, b2y = segments[:, 0], segments[:, 1], segments[:, 2], segments[:, 3]
+    a1x, a1y = a1
+    a2x, a2y = a2
+
+    # No intersection if the ending point of a is the starting point of b or the starting point of a is the ending of b
+    shared = ((b1x == a2x) & (b1y == a2y)) | ((b2x == a1x) & (b2y == a1y))
+
+    boxes = (min(a1x, a2x) <= np.maximum(b1x, b2x)) & \
+            (max(a1x, a2x) >= np.minimum(b1x, b2x)) & \
+            (min(a1y, a2y) <= np.maximum(b1y, b2y)) & \
+            (max(a1y, a2y) >= np.minimum(b1y, b2y))
+
+    # Segment a crosses the line generated by b
+    dx, dy = a2x - a1x, a2y - a1y
+    a_crosses_b = (dx * (b1y - a1y) - dy * (b1x - a1x) < 0) != (dx * (b2y - a1y) - dy * (b2x - a1x) < 0)
+
+    # Segment b crosses the line generated by a
+    ex, ey = b2x - b1x, b2y - b1y
+    b_crosses_a = (ex * (a1y - b1y) - ey * (a1x - b1x) < 0) != (ex * (a2y - b1y) - ey * (a2x - b1x) < 0)
+
+    return ~shared & boxes & a_crosses_b & b_crosses_a
+
 # -------------------#
@@ -0,0 +1,217 @@
+import random
+import time
+import Backtracking as BT
+
+# Maximum number of moves of the local search (over all the restarts)
+MAX_STEPS = 100000
+
+# Number of moves without improving the best number of conflicts before a restart
+RESTART_STEPS = 10000
+
+# Number of moves during which a node cannot take back the color it just left
+TABU_TENURE = 10
+
+
+class ConflictState:
+    """
+
+    Class that represents a complete (possibly inconsistent) coloring explored by the local search, with the counters
+    needed to evaluate each move in constant time
+
+    Attributes:
+        self._compiled      (CompiledGraph) integer-indexed structure of the graph
+        self._domains       (list) bitmask domain of each node (the colors it can take), indexed by node id
+        self._n_colors      (int) number of colors of the palette
+        self._colors        (list) index of the current color of each node (-1 if not colored yet)
+        self._counts        (list) number of neighbors of each node with each color, indexed by node * n_colors + color
+        self._conflicted    (list) ids of the nodes with at least one neighbor of the same color (in no order)
+        self._positions     (list) position of each node in self._conflicted, -1 if it is not conflicted
+        self._n_conflicts   (int) number of edges whose nodes have the same color
+
+    """
+
+    def __init__(self, compiled, domains):
+        self._compiled = compiled
+        self._domains = domains
+        self._n_colors = max(domains, default=0).bit_length()
+        self._colors = [-1] * compiled.get_n_nodes()
+        self._counts = [0] * (compiled.get_n_nodes() * self._n_colors)
+        self._conflicted = []
+        self._positions = [-1] * compiled.get_n_nodes()
+        self._n_conflicts = 0
+
+    def get_domains(self):
+        return self._domains
+
+    def get_colors(self):
+        return self._colors
+
+    def get_counts(self):
+        return self._counts
+
+    def get_n_colors(self):
+        return self._n_colors
+
+    def get_conflicted(self):
+        return self._conflicted
+
+    def get_n_conflicts(self):
+        return self._n_conflicts
+
+    def update_conflicted(self, node):
+
+        """
+
+        Adds node to the conflicted nodes or removes it, according to its counters (O(1): the removed node is replaced
+        by the last one of the list)
+
+        :param node: (int) id of the node
+
+        """
+
+        color = self._colors[node]
+        conflicted = color >= 0 and self._counts[node * self._n_colors + color] > 0
+        position = self._positions[node]
+
+        if conflicted and position < 0:
+            self._positions[node] = len(self._conflicted)
+            self._conflicted.append(node)
+        elif not conflicted and position >= 0:
+            last = self._conflicted.pop()
+            if last != node:
+                self._conflicted[position] = last
+                self._positions[last] = position
+            self._positions[node] = -1
+
+    def set_color(self, node, color):
+
+        """
+
+        Changes the color of node, updating the counters of its neighbors
+
+        :param node:  (int) id of the node
+        :param color: (int) index of the new color
+
+        """
+
+        n_colors = self._n_colors
+        counts = self._counts
+        old = self._colors[node]
+        if old >= 0:
+            self._n_conflicts -= counts[node * n_colors + old]
+        self._n_conflicts += counts[node * n_colors + color]
+        self._colors[node] = color
+
+        for neighbor in self._compiled.get_neighbors(node):
+            if old >= 0:
+                counts[neighbor * n_colors + old] -= 1
+            counts[neighbor * n_colors + color] += 1
+            self.update_conflicted(neighbor)
+        self.update_conflicted(node)
+
+
+def greedy_coloring(state, order, rng):
+
+    """
+
+    Colors the nodes in the given order, each one with the color of its domain shared by the fewest colored neighbors
+    (ties broken at random)
+
+    :param state: (ConflictState) state of the local search
+    :param order: (list) ids of the nodes
+    :param rng:   (random.Random) random generator of the search
+
+    """
+
+    domains = state.get_domains()
+    counts = state.get_counts()
+    n_colors = state.get_n_colors()
+    for node in order:
+        scores = [(counts[node * n_colors + color], rng.random(), color) for color in BT.iter_colors(domains[node])]
+        state.set_color(node, min(scores)[2])
+
+
+def min_conflicts(compiled, domains, max_steps=MAX_STEPS, restart_steps=RESTART_STEPS, tabu_tenure=TABU_TENURE,
+                  seed=0, stats=None):
+
+    """
+
+    Min-conflicts local search with a tabu list. Starting from a greedy coloring, at each step a random conflicted node
+    takes the color with the fewest conflicts among its neighbors; the color it leaves is tabu for the node for
+    tabu_tenure steps, unless taking it back gives the best coloring found so far. The search restarts from a new
+    greedy coloring (in random order) when it does not improve for restart_steps steps.
+
+    Unlike the backtracking search, the local search cannot prove that there is no solution: it gives up after
+    max_steps steps.
+
+    :param compiled:        (CompiledGraph) integer-indexed structure of the graph
+    :param domains:         (list) list of the initial bitmask domains of the nodes, indexed by node id
+    :param max_steps:       (int) maximum number of steps over all the restarts
+    :param restart_steps:   (int) number of steps without improvement before a restart
+    :param tabu_tenure:     (int) number of steps during which a node cannot take back the color it left
+    :param seed:            (int) seed of the random generator of the search
+    :param stats:           (SearchStats) if given, it is filled with the statistics of the search
+    :return:                (list) final bitmask domain (single color) of each node id, False if no solution was found
+                            within max_steps steps
+
+    """
+
+    stats = stats if stats is not None else BT.SearchStats()
+    start = time.perf_counter()
+    rng = random.Random(seed)
+    if 0 in domains:
+        return False
+
+    order = list(range(compiled.get_n_nodes()))
+    step = 0
+    while True:
+        state = ConflictState(compiled, domains)
+        greedy_coloring(state, order, rng)
+        colors = state.get_colors()
+        counts = state.get_counts()
+        n_colors = state.get_n_colors()
+        tabu = [0] * len(counts)
+        best = state.get_n_conflicts()
+        last_improvement = step
+
+        while state.get_n_conflicts() > 0 and step < max_steps and step - last_improvement < restart_steps:
+            step += 1
+            conflicted = state.get_conflicted()
+            node = conflicted[rng.randrange(len(conflicted))]
+            old = colors[node]
+            base = node * n_colors
+            current = state.get_n_conflicts() - counts[base + old]
+
+            # Best non-tabu color (or tabu color improving the best coloring), ties broken at random
+            best_color, best_score, ties = -1, 0, 0
+            for color in BT.iter_colors(domains[node]):
+                score = counts[base + color]
+                if color == old or (tabu[base + color] > step and current + score >= best):
+                    continue
+                if best_color < 0 or score < best_score:
+                    best_color, best_score, ties = color, score, 1
+                elif score == best_score:
+                    ties += 1
+                    if rng.randrange(ties) == 0:
+                        best_color = color
+
+            if best_color < 0:
+                continue
+
+            tabu[base + old] = step + tabu_tenure
+            state.set_color(node, best_color)
+            stats.moves += 1
+            if state.get_n_conflicts() < best:
+                best = state.get_n_conflicts()
+                last_improvement = step
+
+        if state.get_n_conflicts() == 0:
+            stats.time_total += time.perf_counter() - start
+            return [1 << color for color in colors]
+
+        if step >= max_steps:
+            stats.time_total += time.perf_counter() - start
+            return False
+
+        stats.restarts += 1
+        rng.shuffle(order)
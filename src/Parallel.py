@@ -0,0 +1,379 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import Backtracking as BT
+
+
+def get_n_workers(workers=None):
+
+    """
+
+    Returns the number of worker processes to use
+
+    :param workers: (int) requested number of workers, None to use all the cores
+    :return:        (int) number of workers
+
+    """
+
+    if workers is None:
+        return os.cpu_count() or 1
+
+    return max(1, workers)
+
+
+def map_tasks(function, tasks, workers=None, chunksize=1):
+
+    """
+
+    Runs function on each task in a pool of processes and returns the results in the same order of the tasks. The
+    function must be defined at module level (it is sent to the worker processes). With a single worker the tasks
+    are run in the current process.
+
+    :param function:    (function) function called with each task as its only argument
+    :param tasks:       (iterable) arguments of the calls
+    :param workers:     (int) number of worker processes, None to use all the cores
+    :param chunksize:   (int) number of tasks sent to a worker at a time
+    :return:            (list) results of the calls, in order
+
+    """
+
+    workers = get_n_workers(workers)
+
+    if workers == 1:
+        return [function(task) for task in tasks]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(function, tasks, chunksize=chunksize))
+
+
+def imap_unordered(function, tasks, workers=None, max_in_flight=None):
+
+    """
+
+    Runs function on each task in a pool of processes and returns the results as soon as they are ready (not in the
+    order of the tasks). The tasks are read lazily and at most max_in_flight of them are submitted at a time, so an
+    arbitrarily long stream of tasks is processed in constant memory. With a single worker the tasks are run in the
+    current process.
+
+    :param function:        (function) function called with each task as its only argument (defined at module level)
+    :param tasks:           (iterable) arguments of the calls
+    :param workers:         (int) number of worker processes, None to use all the cores
+    :param max_in_flight:   (int) maximum number of tasks submitted and not returned yet, None for twice the workers
+    :return:                (generator) results of the calls, in order of completion
+
+    """
+
+    workers = get_n_workers(workers)
+
+    if workers == 1:
+        for task in tasks:
+            yield function(task)
+        return
+
+    tasks = iter(tasks)
+    max_in_flight = 2 * workers if max_in_flight is None else max(1, max_in_flight)
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = {executor.submit(function, task) for task in itertools.islice(tasks, max_in_flight)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            pending |= {executor.submit(function, task) for task in itertools.islice(tasks, len(done))}
+            for future in done:
+                yield future.result()
+    finally:
+        # If the results are not consumed until the end, the tasks not started yet are dropped
+        executor.shutdown(cancel_futures=True)
+
+
+# Seconds between two checks of the worker processes while waiting for an answer
+POLL_INTERVAL = 0.05
+
+# Subproblems created for each worker by the initial split of parallel_search
+SPLIT_FACTOR = 4
+
+# Search nodes a worker of parallel_search expands on a subproblem before splitting it again
+SPLIT_BUDGET = 2000
+
+# Solver configurations raced by portfolio: name --> options (bt_type, propagator, value_ordering)
+PORTFOLIO = {
+    "FC": {"bt_type": "ForwardChecking"},
+    "MAC": {"bt_type": "Mac"},
+    "MAC-Residual": {"bt_type": "Mac", "propagator": "Residual"},
+    "FC-Palette": {"bt_type": "ForwardChecking", "value_ordering": "Palette"},
+    "MAC-Palette": {"bt_type": "Mac", "value_ordering": "Palette"},
+}
+
+
+def solve_config(compiled, domains, config, stats=None, max_nodes=None, hints=None):
+
+    """
+
+    Runs the backtracking search with the given solver configuration
+
+    :param compiled:    (CompiledGraph) integer-indexed structure of the graph
+    :param domains:     (list) initial bitmask domains of the nodes, indexed by node id
+    :param config:      (dict) solver options: "bt_type" ("ForwardChecking" or "Mac"), "propagator",
+                        "value_ordering", "max_nogoods" and "symmetry_breaking" (optional)
+    :param stats:       (SearchStats) if given, it is filled with the statistics of the search
+    :param max_nodes:   (int) maximum number of search nodes to expand, None for no limit
+    :param hints:       (list) color to be tried first for each node id (-1 for none), None if there are no hints
+    :return:            (list) final bitmask domains, False if there is no solution, None if max_nodes was reached
+
+    """
+
+    state = BT.SearchState(compiled, domains, config.get("propagator", "AC3"), stats,
+                           config.get("value_ordering", "LCV"), config.get("max_nogoods", BT.NOGOOD_CAPACITY),
+                           config.get("symmetry_breaking", True), hints)
+
+    return BT.backtrack(state, BT.INFERENCES[config["bt_type"]], None, None, False, config["bt_type"], max_nodes)
+
+
+def portfolio_worker(compiled, domains, name, config, results):
+
+    """
+
+    Body of each process of portfolio: solves the problem and puts (name, result) in the results queue
+
+    :param compiled:    (CompiledGraph) integer-indexed structure of the graph
+    :param domains:     (list) initial bitmask domains of the nodes, indexed by node id
+    :param name:        (String) name of the solver configuration
+    :param config:      (dict) solver options (see solve_config)
+    :param results:     (multiprocessing.Queue) queue shared with the main process
+
+    """
+
+    try:
+        results.put((name, solve_config(compiled, domains, config)))
+    except Exception as e:
+        results.put((name, e))
+
+
+def portfolio(compiled, domains, configs=None, timeout=None):
+
+    """
+
+    Portfolio solving: launches each solver configuration in its own process and returns the first answer, either
+    a complete coloring or a proof that there is none (every configuration is a complete search, so the first False
+    is a proof of unsatisfiability). The other processes are then terminated.
+
+    :param compiled:    (CompiledGraph) integer-indexed structure of the graph
+    :param domains:     (list) initial bitmask domains of the nodes, indexed by node id
+    :param configs:     (dict) solver configurations {name: options} (see solve_config), PORTFOLIO by default
+    :param timeout:     (float) seconds to wait for an answer, None to wait until the first one
+    :return:            (tuple) final bitmask domains (False if there is no solution, None on timeout) and the name
+                        of the configuration that answered first (None on timeout)
+
+    """
+
+    configs = PORTFOLIO if configs is None else configs
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=portfolio_worker, args=(compiled, domains, name, config, results),
+                                         daemon=True)
+                 for name, config in configs.items()]
+
+    for process in processes:
+        process.start()
+
+    try:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        answered = 0
+        while answered < len(processes):
+            try:
+                name, result = results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                if not any(process.is_alive() for process in processes) and results.empty():
+                    break   # Every process died without answering
+                continue
+
+            answered += 1
+            if not isinstance(result, Exception):   # A crashed configuration does not stop the race
+                return result, name
+
+        return None, None
+
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+
+
+def expand(compiled, domains, config):
+
+    """
+
+    Splits a subproblem at its first decision: the nodes with a single color left are assigned first (with their
+    inferences), then each value of the next node selected by the search heuristics gives a child subproblem, with
+    the domains reduced by the inference. The children cover all the solutions of the subproblem.
+
+    :param compiled:    (CompiledGraph) integer-indexed structure of the graph
+    :param domains:     (list) bitmask domains of the subproblem
+    :param config:      (dict) solver options (see solve_config)
+    :return:            (tuple) a solution (bitmask domains) if the subproblem is already solved, otherwise None, and
+                        the list of the domains of the children (empty if the subproblem has no solution)
+
+    """
+
+    state = BT.SearchState(compiled, domains, config.get("propagator", "AC3"),
+                           value_ordering=config.get("value_ordering", "LCV"),
+                           symmetry_breaking=config.get("symmetry_breaking", True))
+    inference = BT.INFERENCES[config["bt_type"]]
+
+    var = BT.select_unassigned_variable(state)
+    while var is not None and BT.is_singleton(state.get_domains()[var]):
+        value = state.get_domains()[var].bit_length() - 1
+        state.assign(var)
+        if not BT.check_value_consistent(var, value, state) or not inference(state, var, value):
+            return None, []
+        var = BT.select_unassigned_variable(state)
+
+    if var is None:
+        return list(state.get_domains()), []
+
+    children = []
+    mark = state.mark()
+    state.assign(var)
+    for value in BT.order_domain_values(state, var):
+        if BT.check_value_consistent(var, value, state) and inference(state, var, value):
+            children.append(list(state.get_domains()))
+        state.undo(mark)
+
+    return None, children
+
+
+def split(compiled, domains, config, n_subproblems):
+
+    """
+
+    Splits the top of the search tree breadth-first until there are at least n_subproblems independent subproblems
+    (or the tree cannot be split anymore)
+
+    :param compiled:        (CompiledGraph) integer-indexed structure of the graph
+    :param domains:         (list) initial bitmask domains of the nodes
+    :param config:          (dict) solver options (see solve_config)
+    :param n_subproblems:   (int) number of subproblems wanted
+    :return:                (tuple) a solution found while splitting (None otherwise) and the list of subproblems
+
+    """
+
+    subproblems = deque([domains])
+    while subproblems and len(subproblems) < n_subproblems:
+        solution, children = expand(compiled, subproblems.popleft(), config)
+        if solution is not None:
+            return solution, []
+        subproblems.extend(children)
+
+    return None, list(subproblems)
+
+
+def tree_search_worker(compiled, config, tasks, results):
+
+    """
+
+    Body of each process of parallel_search: takes a subproblem (domains, node budget) from the tasks queue and solves
+    it. If the budget is exhausted the subproblem is split again and its children are sent back to be shared with the
+    other workers, each with a doubled budget.
+
+    :param compiled:    (CompiledGraph) integer-indexed structure of the graph
+    :param config:      (dict) solver options (see solve_config)
+    :param tasks:       (multiprocessing.Queue) subproblems to solve, None to stop
+    :param results:     (multiprocessing.Queue) tuples ("solution", domains), ("unsat", None), ("split", children)
+                        or ("error", exception)
+
+    """
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+
+        domains, budget = task
+        try:
+            result = solve_config(compiled, domains, config, max_nodes=budget)
+            if result is None:
+                solution, children = expand(compiled, domains, config)
+                if solution is not None:
+                    results.put(("solution", solution))
+                else:
+                    results.put(("split", [(child, 2 * budget) for child in children]))
+            elif result is False:
+                results.put(("unsat", None))
+            else:
+                results.put(("solution", result))
+        except Exception as e:
+            results.put(("error", e))
+
+
+def parallel_search(compiled, domains, config, workers=None, budget=SPLIT_BUDGET):
+
+    """
+
+    Parallel tree search: the first levels of the search tree are split into independent subproblems (partial
+    assignments with reduced domains) that are solved by a pool of processes. A subproblem that takes more than its
+    node budget is split again and its children go back to the shared queue, so idle workers pick up the work left by
+    the hard subtrees. The first solution found stops all the workers.
+
+    :param compiled:    (CompiledGraph) integer-indexed structure of the graph
+    :param domains:     (list) initial bitmask domains of the nodes, indexed by node id
+    :param config:      (dict) solver options (see solve_config)
+    :param workers:     (int) number of worker processes, None to use all the cores
+    :param budget:      (int) search nodes a worker expands on a subproblem before splitting it again
+    :return:            (list) final bitmask domains, False if there is no solution
+
+    """
+
+    workers = get_n_workers(workers)
+    solution, subproblems = split(compiled, domains, config, SPLIT_FACTOR * workers)
+    if solution is not None:
+        return solution
+    if not subproblems:
+        return False
+
+    tasks = multiprocessing.Queue()
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=tree_search_worker, args=(compiled, config, tasks, results),
+                                         daemon=True)
+                 for _ in range(workers)]
+
+    for process in processes:
+        process.start()
+
+    pending = len(subproblems)
+    for subproblem in subproblems:
+        tasks.put((subproblem, budget))
+
+    try:
+        while pending > 0:
+            try:
+                kind, value = results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    raise RuntimeError("All the workers of the parallel search died")
+                continue
+
+            if kind == "solution":
+                return value
+            elif kind == "unsat":
+                pending -= 1
+            elif kind == "split":
+                pending += len(value) - 1
+                for task in value:
+                    tasks.put(task)
+            else:
+                raise value
+
+        return False
+
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
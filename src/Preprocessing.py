@@ -0,0 +1,175 @@
+import Backtracking as BT
+import Parallel
+
+
+def peel(compiled, n_colors):
+
+    """
+
+    Removes repeatedly the nodes with less than n_colors neighbors left: whatever the colors of its neighbors, such a
+    node always has a free color, so it can be colored after the rest of the graph (in reverse order of removal)
+
+    :param compiled:    (CompiledGraph) integer-indexed structure of the graph
+    :param n_colors:    (int) number of colors
+    :return:            (tuple) list of the ids of the removed nodes (in order of removal) and list of the ids of
+                        the remaining nodes (the core of the graph)
+
+    """
+
+    adjacency = compiled.get_adjacency()
+    degrees = compiled.get_degrees().tolist()
+    removed = bytearray(compiled.get_n_nodes())
+    queue = [node for node, degree in enumerate(degrees) if degree < n_colors]
+    for node in queue:
+        removed[node] = 1
+
+    # The queue grows while it is read: the neighbors left with less than n_colors neighbors are appended
+    for node in queue:
+        for neighbor in adjacency[node]:
+            degrees[neighbor] -= 1
+            if not removed[neighbor] and degrees[neighbor] < n_colors:
+                removed[neighbor] = 1
+                queue.append(neighbor)
+
+    return queue, [node for node in range(compiled.get_n_nodes()) if not removed[node]]
+
+
+def get_blocks(compiled):
+
+    """
+
+    Splits the graph into its biconnected components (blocks), separated by the articulation points (iterative
+    Hopcroft-Tarjan algorithm). The blocks are returned so that the first node of each block is the only one shared
+    with the blocks before it (if any): coloring them in this order, each block has to agree with the rest on that node
+    only. Blocks of different connected components share no nodes.
+
+    :param compiled:    (CompiledGraph) integer-indexed structure of the graph
+    :return:            (list) lists of the node ids of each block
+
+    """
+
+    adjacency = compiled.get_adjacency()
+    discovery = [-1] * compiled.get_n_nodes()
+    low = [0] * compiled.get_n_nodes()
+    blocks = []
+    counter = 0
+
+    for root in range(compiled.get_n_nodes()):
+        if discovery[root] >= 0:
+            continue
+        discovery[root] = low[root] = counter
+        counter += 1
+        if not adjacency[root]:
+            blocks.append([root])
+            continue
+
+        visited = [root]
+        stack = [(root, -1, iter(adjacency[root]))]
+        while stack:
+            node, parent, neighbors = stack[-1]
+            for neighbor in neighbors:
+                if discovery[neighbor] < 0:
+                    discovery[neighbor] = low[neighbor] = counter
+                    counter += 1
+                    visited.append(neighbor)
+                    stack.append((neighbor, node, iter(adjacency[neighbor])))
+                    break
+                if neighbor != parent:
+                    low[node] = min(low[node], discovery[neighbor])
+            else:
+                stack.pop()
+                if not stack:
+                    continue
+                low[parent] = min(low[parent], low[node])
+
+                # parent separates the subtree of node from the rest: the visited nodes down to node form a block
+                if low[node] >= discovery[parent]:
+                    block = [parent]
+                    while block[-1] != node:
+                        block.append(visited.pop())
+                    blocks.append(block)
+
+    # A block is found after all the blocks below it, so the reverse order starts from the root of each component
+    blocks.reverse()
+
+    return blocks
+
+
+def solve_block(task):
+
+    """
+
+    Solves the coloring of a block (run in a worker process when the blocks are solved in parallel)
+
+    :param task: (tuple) subgraph of the block (CompiledGraph), number of colors, solver options (see
+                 Parallel.solve_config) and SearchStats to be filled (None in the worker processes)
+    :return:     (list) index of the color of each node of the subgraph, False if there is no solution
+
+    """
+
+    subgraph, n_colors, config, stats = task
+    result = Parallel.solve_config(subgraph, [BT.get_full_domain(n_colors)] * subgraph.get_n_nodes(), config, stats)
+    if result is False:
+        return False
+
+    return [domain.bit_length() - 1 for domain in result]
+
+
+def solve(compiled, n_colors, config, workers=1, stats=None):
+
+    """
+
+    Solves the graph coloring after reducing the graph: the nodes with less than n_colors neighbors are peeled, the
+    core left is split into blocks at its articulation points and each block is solved independently. The colorings of
+    the blocks are merged by swapping two colors of each block so that it agrees on its shared node (the colors are
+    interchangeable), then the peeled nodes are colored in reverse order of removal.
+
+    :param compiled:    (CompiledGraph) integer-indexed structure of the graph
+    :param n_colors:    (int) number of colors
+    :param config:      (dict) solver options (see Parallel.solve_config)
+    :param workers:     (int) number of worker processes solving the blocks, None to use all the cores
+    :param stats:       (SearchStats) if given, it is filled with the statistics of the searches (single worker only)
+    :return:            (list) index of the color of each node id, False if there is no solution
+
+    """
+
+    adjacency = compiled.get_adjacency()
+    peeled, core = peel(compiled, n_colors)
+    core_graph = compiled.subgraph(core)
+    blocks = get_blocks(core_graph)
+    tasks = [(core_graph.subgraph(block), n_colors, config, stats) for block in blocks]
+
+    if stats is not None:
+        stats.nodes_peeled += len(peeled)
+        stats.blocks_solved += len(blocks)
+
+    if Parallel.get_n_workers(workers) == 1:
+        results = []
+        for task in tasks:
+            results.append(solve_block(task))
+            if results[-1] is False:
+                return False
+    else:
+        results = Parallel.map_tasks(solve_block, [task[:3] + (None,) for task in tasks], workers)
+        if False in results:
+            return False
+
+    colors = [-1] * compiled.get_n_nodes()
+    for block, block_colors in zip(blocks, results):
+        shared = core[block[0]]
+        if colors[shared] >= 0:
+            permutation = list(range(n_colors))
+            permutation[block_colors[0]], permutation[colors[shared]] = colors[shared], block_colors[0]
+            block_colors = [permutation[color] for color in block_colors]
+        for node, color in zip(block, block_colors):
+            colors[core[node]] = color
+
+    for node in reversed(peeled):
+        used = 0
+        for neighbor in adjacency[node]:
+            if colors[neighbor] >= 0:
+                used |= 1 << colors[neighbor]
+        free = ~used
+        colors[node] = (free & -free).bit_length() - 1
+
+    return colors
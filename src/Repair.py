@@ -0,0 +1,142 @@
+import Backtracking as BT
+import CompiledGraph
+import Parallel
+
+# Maximum radius (in edges) of the neighborhood searched by the local repair before falling back to a full search
+MAX_RADIUS = 8
+
+
+def get_conflicts(adjacency, assignment, labels):
+
+    """
+
+    Returns the nodes among labels that have no color or the same color of one of their neighbors
+
+    :param adjacency:   (dict) Dict containing key: node label, value: labels of the neighbors
+    :param assignment:  (dict) color assignment {node: [color]}
+    :param labels:      (iterable) labels of the nodes to check
+    :return:            (list) labels of the conflicted nodes
+
+    """
+
+    return [label for label in labels
+            if label not in assignment or any(assignment.get(neighbor) == assignment[label]
+                                              for neighbor in adjacency[label])]
+
+
+def get_ball(adjacency, sources, radius):
+
+    """
+
+    Returns the nodes at distance at most radius (in edges) from the source nodes (breadth-first search)
+
+    :param adjacency:   (dict) Dict containing key: node label, value: labels of the neighbors
+    :param sources:     (list) labels of the source nodes
+    :param radius:      (int) maximum distance
+    :return:            (list) labels of the nodes of the ball, in order of distance
+
+    """
+
+    ball = dict.fromkeys(sources)
+    frontier = list(ball)
+    for _ in range(radius):
+        next_frontier = []
+        for label in frontier:
+            for neighbor in adjacency[label]:
+                if neighbor not in ball:
+                    ball[neighbor] = None
+                    next_frontier.append(neighbor)
+        if not next_frontier:
+            break
+        frontier = next_frontier
+
+    return list(ball)
+
+
+def repair_ball(adjacency, assignment, ball, palette, config):
+
+    """
+
+    Recolors the nodes of the ball keeping the colors of all the other nodes fixed: the domain of each node of the
+    ball excludes the colors of its neighbors outside the ball, and its previous color is tried first (value hint), so
+    the nodes that do not need to change keep their color
+
+    :param adjacency:   (dict) Dict containing key: node label, value: labels of the neighbors
+    :param assignment:  (dict) color assignment {node: [color]} of the nodes outside the ball
+    :param ball:        (list) labels of the nodes to recolor
+    :param palette:     (list) indexed color palette
+    :param config:      (dict) solver options (see Parallel.solve_config)
+    :return:            (tuple) the new color assignment {node: [color]} of the ball (False if there is none) and True
+                        if the ball has neighbors outside it
+
+    """
+
+    ids = {label: node_id for node_id, label in enumerate(ball)}
+    color_ids = {color: index for index, color in enumerate(palette)}
+    full_domain = BT.get_full_domain(len(palette))
+    domains = []
+    hints = []
+    edges = []
+    bounded = False
+
+    for node_id, label in enumerate(ball):
+        domain = full_domain
+        for neighbor in adjacency[label]:
+            if neighbor in ids:
+                if node_id < ids[neighbor]:
+                    edges.append((node_id, ids[neighbor]))
+            else:
+                bounded = True
+                if neighbor in assignment:
+                    domain &= ~(1 << color_ids[assignment[neighbor][0]])
+        domains.append(domain)
+        hints.append(color_ids[assignment[label][0]] if label in assignment else -1)
+
+    compiled = CompiledGraph.CompiledGraph(ball, edges)
+    result = Parallel.solve_config(compiled, domains, config, hints=hints)
+    if result is False:
+        return False, bounded
+
+    return compiled.to_label_dict(BT.decode_assignment(result, palette)), bounded
+
+
+def repair(adjacency, assignment, touched, palette, config, max_radius=MAX_RADIUS):
+
+    """
+
+    Repairs a coloring after some edits of the graph. Only the touched nodes are checked for conflicts, then the nodes
+    around the conflicted ones are recolored with the rest of the coloring fixed; the radius of the recolored
+    neighborhood is doubled each time the repair fails, up to max_radius. The cost depends on the size of the edit,
+    not on the size of the graph.
+
+    :param adjacency:   (dict) Dict containing key: node label, value: labels of the neighbors
+    :param assignment:  (dict) color assignment {node: [color]} valid before the edits
+    :param touched:     (iterable) labels of the nodes added or linked to a new neighbor by the edits
+    :param palette:     (list) indexed color palette
+    :param config:      (dict) solver options (see Parallel.solve_config)
+    :param max_radius:  (int) maximum radius of the recolored neighborhood
+    :return:            (dict) the repaired color assignment {node: [color]}, False if the graph cannot be colored,
+                        None if the local repair failed (a full search is needed)
+
+    """
+
+    conflicts = get_conflicts(adjacency, assignment, touched)
+    if not conflicts:
+        return dict(assignment)
+
+    radius = 1
+    while radius <= max_radius:
+        ball = get_ball(adjacency, conflicts, radius)
+        colors, bounded = repair_ball(adjacency, assignment, ball, palette, config)
+        if colors is not False:
+            result = dict(assignment)
+            result.update(colors)
+            return result
+
+        # The ball contains the whole connected components of the conflicted nodes: they cannot be colored
+        if not bounded:
+            return False
+
+        radius *= 2
+
+    return None
@@ -0,0 +1,284 @@
+import heapq
+import math
+import numpy as np
+
+
+def get_cell(point, cell_size):
+
+    """
+
+    Returns the grid cell that contains the given point
+
+    :param point:       (tuple) x, y coordinates of the point
+    :param cell_size:   (float) Side of each square cell of the grid
+    :return:            (tuple) cx, cy integer coordinates of the cell
+
+    """
+
+    return math.floor(point[0] / cell_size), math.floor(point[1] / cell_size)
+
+
+class EdgeGrid:
+    """
+
+    Uniform grid used as spatial index for the edges of the graph. Each edge is stored in every cell covered by its
+    bounding box, so that only the edges lying near a segment have to be checked for intersections with it.
+
+    Attributes:
+        self._cell_size     (float) Side of each square cell of the grid
+        self._cells         (dict) Dict containing key: cell, value: list of the ids of the edges covering the cell
+        self._edges         (list) List of all the edges stored in the grid (the id of an edge is its index)
+        self._segments      (numpy array) Array of shape (capacity, 4) with the x1, y1, x2, y2 coordinates of each edge
+
+    """
+
+    def __init__(self, cell_size):
+        self._cell_size = cell_size
+        self._cells = {}
+        self._edges = []
+        self._segments = np.empty((16, 4), dtype=np.float64)
+
+    def get_cell_range(self, p1, p2):
+
+        """
+
+        Returns the lower-left and upper-right cells covered by the bounding box of the segment p1-p2
+
+        :param p1: (tuple) Starting point coordinates of the segment
+        :param p2: (tuple) Ending point coordinates of the segment
+        :return:   (tuple) min_x, min_y, max_x, max_y cell coordinates
+
+        """
+
+        min_x, min_y = get_cell((min(p1[0], p2[0]), min(p1[1], p2[1])), self._cell_size)
+        max_x, max_y = get_cell((max(p1[0], p2[0]), max(p1[1], p2[1])), self._cell_size)
+
+        return min_x, min_y, max_x, max_y
+
+    def get_cells(self, p1, p2):
+
+        """
+
+        Returns all the cells covered by the bounding box of the segment p1-p2
+
+        :param p1: (tuple) Starting point coordinates of the segment
+        :param p2: (tuple) Ending point coordinates of the segment
+        :return:   (generator) cells covered by the bounding box
+
+        """
+
+        min_x, min_y, max_x, max_y = self.get_cell_range(p1, p2)
+
+        for cx in range(min_x, max_x + 1):
+            for cy in range(min_y, max_y + 1):
+                yield cx, cy
+
+    def insert(self, edge, p1, p2):
+
+        """
+
+        Adds the edge to every cell covered by its bounding box
+
+        :param edge: (tuple) Labels of the two nodes of the edge
+        :param p1:   (tuple) Coordinates of the first node of the edge
+        :param p2:   (tuple) Coordinates of the second node of the edge
+
+        """
+
+        edge_id = len(self._edges)
+        self._edges.append(edge)
+
+        # The coordinates array doubles its capacity when it is full
+        if edge_id == len(self._segments):
+            self._segments = np.concatenate((self._segments, np.empty_like(self._segments)))
+        self._segments[edge_id] = (p1[0], p1[1], p2[0], p2[1])
+
+        for cell in self.get_cells(p1, p2):
+            self._cells.setdefault(cell, []).append(edge_id)
+
+    def remove(self, edge_id):
+
+        """
+
+        Removes the edge with the given id. The last edge takes its id (and the ids of the other edges do not change),
+        as in a swap-remove from the list of the edges.
+
+        :param edge_id: (int) id of the edge to remove
+
+        """
+
+        last = len(self._edges) - 1
+        x1, y1, x2, y2 = self._segments[edge_id].tolist()
+        for cell in self.get_cells((x1, y1), (x2, y2)):
+            self._cells[cell].remove(edge_id)
+
+        if edge_id != last:
+            x1, y1, x2, y2 = self._segments[last].tolist()
+            for cell in self.get_cells((x1, y1), (x2, y2)):
+                edge_ids = self._cells[cell]
+                edge_ids[edge_ids.index(last)] = edge_id
+            self._edges[edge_id] = self._edges[last]
+            self._segments[edge_id] = self._segments[last]
+
+        self._edges.pop()
+
+    def query(self, p1, p2):
+
+        """
+
+        Returns the edges whose bounding box may intersect the bounding box of the segment p1-p2. Every edge whose
+        bounding box touches the one of the segment is returned (each edge only once).
+
+        :param p1: (tuple) Starting point coordinates of the segment
+        :param p2: (tuple) Ending point coordinates of the segment
+        :return:   (set) set of the ids of the candidate edges
+
+        """
+
+        # A long segment covers more cells than there are edges: scanning all of them is cheaper
+        min_x, min_y, max_x, max_y = self.get_cell_range(p1, p2)
+        if (max_x - min_x + 1) * (max_y - min_y + 1) > len(self._edges):
+            return set(range(len(self._edges)))
+
+        candidates = set()
+        for cell in self.get_cells(p1, p2):
+            if cell in self._cells:
+                candidates.update(self._cells[cell])
+
+        return candidates
+
+    def query_segments(self, p1, p2):
+
+        """
+
+        Returns the coordinates of the candidate edges of the segment p1-p2 (see query), ready for the vectorized
+        intersection check
+
+        :param p1: (tuple) Starting point coordinates of the segment
+        :param p2: (tuple) Ending point coordinates of the segment
+        :return:   (numpy array) Array of shape (N, 4) with the x1, y1, x2, y2 coordinates of the candidate edges
+
+        """
+
+        candidates = self.query(p1, p2)
+        if len(candidates) == len(self._edges):
+            return self._segments[:len(self._edges)]
+
+        return self._segments[np.fromiter(candidates, dtype=np.intp, count=len(candidates))]
+
+
+class PointGrid:
+    """
+
+    Uniform grid used as spatial index for the nodes of the graph. It returns the nodes in ascending order of distance
+    from a given point lazily: the cells are visited in rings around the point and a node is returned only when no
+    node of the unvisited rings can be nearer.
+
+    Attributes:
+        self._points        (list) List of the x, y coordinates of each point (the id of a point is its index)
+        self._cell_size     (float) Side of each square cell of the grid
+        self._cells         (dict) Dict containing key: cell, value: list of the ids of the points in the cell
+        self._bounds        (tuple) min_x, min_y, max_x, max_y coordinates of the non-empty cells
+
+    """
+
+    def __init__(self, points, cell_size):
+        self._points = points
+        self._cell_size = cell_size
+        self._cells = {}
+
+        for point_id, point in enumerate(points):
+            self._cells.setdefault(get_cell(point, cell_size), []).append(point_id)
+
+        if self._cells:
+            self._bounds = (min(cell[0] for cell in self._cells), min(cell[1] for cell in self._cells),
+                            max(cell[0] for cell in self._cells), max(cell[1] for cell in self._cells))
+        else:
+            self._bounds = (0, 0, -1, -1)
+
+    def insert(self, point):
+
+        """
+
+        Adds a new point to the grid
+
+        :param point: (tuple) x, y coordinates of the point
+        :return:      (int) id of the new point
+
+        """
+
+        point_id = len(self._points)
+        self._points.append(point)
+        cell = get_cell(point, self._cell_size)
+        self._cells.setdefault(cell, []).append(point_id)
+
+        if point_id == 0:
+            self._bounds = cell + cell
+        else:
+            min_x, min_y, max_x, max_y = self._bounds
+            self._bounds = (min(min_x, cell[0]), min(min_y, cell[1]), max(max_x, cell[0]), max(max_y, cell[1]))
+
+        return point_id
+
+    def get_ring(self, cx, cy, r):
+
+        """
+
+        Returns the non-empty cells at distance r (in number of cells) from the cell cx, cy
+
+        :param cx: (int) x coordinate of the central cell
+        :param cy: (int) y coordinate of the central cell
+        :param r:  (int) radius of the ring
+        :return:   (generator) cells of the ring
+
+        """
+
+        min_x, min_y, max_x, max_y = self._bounds
+
+        if r == 0:
+            cells = [(cx, cy)]
+        else:
+            cells = []
+            for x in range(max(cx - r, min_x), min(cx + r, max_x) + 1):
+                cells.append((x, cy - r))
+                cells.append((x, cy + r))
+            for y in range(max(cy - r + 1, min_y), min(cy + r - 1, max_y) + 1):
+                cells.append((cx - r, y))
+                cells.append((cx + r, y))
+
+        for cell in cells:
+            if cell in self._cells:
+                yield cell
+
+    def iter_nearest(self, point):
+
+        """
+
+        Returns the ids of all the points in ascending order of Euclidean distance from point (points at the same
+        distance are returned in ascending order of id)
+
+        :param point: (tuple) x, y coordinates of the point
+        :return:      (generator) ids of the points
+
+        """
+
+        cx, cy = get_cell(point, self._cell_size)
+        min_x, min_y, max_x, max_y = self._bounds
+        max_ring = max(cx - min_x, max_x - cx, cy - min_y, max_y - cy, 0)
+
+        heap = []
+        for r in range(max_ring + 1):
+            for cell in self.get_ring(cx, cy, r):
+                for point_id in self._cells[cell]:
+                    heapq.heappush(heap, (math.dist(point, self._points[point_id]), point_id))
+
+            # Every point not visited yet lies outside the square of the rings visited so far
+            bound = min(point[0] - (cx - r) * self._cell_size, (cx + r + 1) * self._cell_size - point[0],
+                        point[1] - (cy - r) * self._cell_size, (cy + r + 1) * self._cell_size - point[1])
+            bound -= 1e-9 * self._cell_size
+
+            while heap and heap[0][0] < bound:
+                yield heapq.heappop(heap)[1]
+
+        while heap:
+            yield heapq.heappop(heap)[1]
@@ -10,6 +10,7 @@ def main():
     # Test.test_graph_visualization(N_NODES, BT_TYPE)
     Test.time_comparison()
     # Test.test_failed_assignment()
+    # Test.propagation_comparison()
 
 
 if __name__ == "__main__":
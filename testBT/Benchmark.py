@@ -0,0 +1,233 @@
+import argparse
+import csv
+import json
+import math
+import timeit
+import src.InstanceCache as InstanceCache
+from src.Backtracking import COLORS
+
+# CONST VALUES #
+SIZES = (10, 20, 50, 100)
+SEEDS = range(5)
+REPEATS = 5
+WARMUP = 1
+
+# Solver configurations: name --> keyword arguments of Graph.backtracking
+SOLVERS = {
+    "FC": {"bt_type": "ForwardChecking"},
+    "MAC": {"bt_type": "Mac"},
+    "MAC-Residual": {"bt_type": "Mac", "propagator": "Residual"},
+    "MAC-Reduced": {"bt_type": "Mac", "preprocess": True},
+    "MinConflicts": {"bt_type": "MinConflicts"},
+}
+
+
+def percentile(values, q):
+    """
+
+    Computes the q-th percentile of values (linear interpolation between the closest ranks)
+
+    :param values: (list) list of numbers
+    :param q:      (float) percentile, between 0 and 100
+    :return:       (float) the percentile, None if values is empty
+
+    """
+
+    if not values:
+        return None
+
+    values = sorted(values)
+    rank = (len(values) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def generate_instance(n_nodes, seed, cache_dir=InstanceCache.CACHE_DIR):
+    """
+
+    Generates the graph identified by (n_nodes, seed), or loads it from the instance cache if it was generated by a
+    previous run (see InstanceCache.get_instance), measuring the time of the generation (or of the loading)
+
+    :param n_nodes:     (int) Number of nodes
+    :param seed:        (int) Seed of the graph
+    :param cache_dir:   (String) directory of the instance cache, None to always generate the graph
+    :return:            (tuple) the Graph and the generation time in seconds
+
+    """
+
+    start = timeit.default_timer()
+    graph = InstanceCache.get_instance(n_nodes, seed, cache_dir)
+
+    return graph, timeit.default_timer() - start
+
+
+def time_solver(graph, solver, repeats, warmup):
+    """
+
+    Runs the solver configuration on the graph warmup times (not measured) and then repeats times
+
+    :param graph:   (Graph) graph to be colored
+    :param solver:  (dict) keyword arguments of Graph.backtracking
+    :param repeats: (int) number of measured runs
+    :param warmup:  (int) number of runs before the measured ones
+    :return:        (tuple) list of the times in seconds, True if the graph is colorable, stats of the last run
+
+    """
+
+    for _ in range(warmup):
+        graph.backtracking(animate=False, verbose=False, **solver)
+
+    times = []
+    result, stats = False, None
+    for _ in range(repeats):
+        start = timeit.default_timer()
+        result, stats = graph.backtracking(animate=False, return_stats=True, verbose=False, **solver)
+        times.append(timeit.default_timer() - start)
+
+    return times, result is not False, stats
+
+
+def run_benchmark(sizes=SIZES, seeds=SEEDS, solvers=None, repeats=REPEATS, warmup=WARMUP,
+                  cache_dir=InstanceCache.CACHE_DIR):
+    """
+
+    Runs every solver configuration on the same seeded instances. Each instance (n_nodes, seed) is generated once (or
+    loaded from the instance cache), and the generation time is measured separately from the solving times.
+
+    :param sizes:       (iterable) numbers of nodes of the instances
+    :param seeds:       (iterable) seeds of the instances (each size is generated with each seed)
+    :param solvers:     (dict) solver configurations {name: keyword arguments of Graph.backtracking}, SOLVERS by default
+    :param repeats:     (int) number of measured runs of each solver on each instance
+    :param warmup:      (int) number of runs before the measured ones
+    :param cache_dir:   (String) directory of the instance cache, None to generate every instance again
+    :return:            (dict) dictionary with the configuration, one row for each run ("runs") and one row for each
+                        solver and size with median/p95/p99 times ("summary")
+
+    """
+
+    solvers = SOLVERS if solvers is None else solvers
+    runs = []
+
+    for n_nodes in sizes:
+        for seed in seeds:
+            graph, generation_time = generate_instance(n_nodes, seed, cache_dir)
+
+            for name, solver in solvers.items():
+                times, colorable, stats = time_solver(graph, solver, repeats, warmup)
+                runs.append({"solver": name, "n_nodes": n_nodes, "seed": seed, "n_edges": len(graph.get_edges()),
+                             "generation_time": generation_time, "times": times, "colorable": colorable,
+                             "nodes_expanded": stats.nodes_expanded, "backtracks": stats.backtracks})
+
+    return {"config": {"sizes": list(sizes), "seeds": list(seeds), "repeats": repeats, "warmup": warmup,
+                       "n_colors": len(COLORS), "solvers": solvers, "cache_dir": cache_dir},
+            "runs": runs,
+            "summary": summarize(runs)}
+
+
+def summarize(runs):
+    """
+
+    Aggregates the runs for each solver and size
+
+    :param runs: (list) rows of the runs returned by run_benchmark
+    :return:     (list) one row for each (solver, n_nodes) with the timing percentiles in milliseconds
+
+    """
+
+    groups = {}
+    for run in runs:
+        groups.setdefault((run["solver"], run["n_nodes"]), []).append(run)
+
+    summary = []
+    for (solver, n_nodes), group in groups.items():
+        times = [t * 1000 for run in group for t in run["times"]]
+        generation_times = [run["generation_time"] * 1000 for run in group]
+        summary.append({"solver": solver, "n_nodes": n_nodes, "instances": len(group),
+                        "colorable": sum(run["colorable"] for run in group),
+                        "generation_median_ms": percentile(generation_times, 50),
+                        "median_ms": percentile(times, 50), "p95_ms": percentile(times, 95),
+                        "p99_ms": percentile(times, 99)})
+
+    return summary
+
+
+def write_json(results, path):
+    """
+
+    Writes the results of run_benchmark to a JSON file
+
+    :param results: (dict) results of run_benchmark
+    :param path:    (String) path of the file
+
+    """
+
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def write_csv(results, path):
+    """
+
+    Writes the summary of the results of run_benchmark to a CSV file
+
+    :param results: (dict) results of run_benchmark
+    :param path:    (String) path of the file
+
+    """
+
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(results["summary"][0]))
+        writer.writeheader()
+        writer.writerows(results["summary"])
+
+
+def print_summary(results):
+    """
+
+    Prints the summary of the results of run_benchmark
+
+    :param results: (dict) results of run_benchmark
+
+    """
+
+    print(f"{'Solver':<14} {'Nodes':>6} {'Colorable':>10} {'Gen (ms)':>10} {'Median (ms)':>12} {'p95 (ms)':>10} "
+          f"{'p99 (ms)':>10}")
+    for row in results["summary"]:
+        print(f"{row['solver']:<14} {row['n_nodes']:>6} {row['colorable']:>4}/{row['instances']:<5} "
+              f"{row['generation_median_ms']:>10.2f} {row['median_ms']:>12.3f} {row['p95_ms']:>10.3f} "
+              f"{row['p99_ms']:>10.3f}")
+
+
+def main():
+    """
+
+    Command line entry point: runs the benchmark without opening any window and writes the results to JSON/CSV
+
+    """
+
+    parser = argparse.ArgumentParser(description="Headless benchmark of the backtracking solvers")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="comma separated numbers of nodes")
+    parser.add_argument("--seeds", type=int, default=len(SEEDS), help="number of seeded instances for each size")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="measured runs for each solver and instance")
+    parser.add_argument("--warmup", type=int, default=WARMUP, help="runs before the measured ones")
+    parser.add_argument("--solvers", default=",".join(SOLVERS), help="comma separated names of SOLVERS")
+    parser.add_argument("--json", help="path of the JSON output")
+    parser.add_argument("--csv", help="path of the CSV output (summary)")
+    parser.add_argument("--cache-dir", default=InstanceCache.CACHE_DIR, help="directory of the instance cache")
+    parser.add_argument("--no-cache", action="store_true", help="generate every instance again")
+    args = parser.parse_args()
+
+    results = run_benchmark([int(n) for n in args.sizes.split(",")], range(args.seeds),
+                            {name: SOLVERS[name] for name in args.solvers.split(",")}, args.repeats, args.warmup,
+                            None if args.no_cache else args.cache_dir)
+
+    print_summary(results)
+    if args.json:
+        write_json(results, args.json)
+    if args.csv:
+        write_csv(results, args.csv)
+
+
+if __name__ == "__main__":
+    main()
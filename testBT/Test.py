@@ -1,6 +1,9 @@
 import timeit
 from matplotlib.ticker import MaxNLocator
+from testBT import Benchmark
 import src.Graph as Graph
+import src.Backtracking as BT
+import src.Batch as Batch
 import matplotlib.pyplot as plt
 from src.Backtracking import COLORS
 
@@ -13,31 +16,24 @@ def time_comparison():
     """
 
     in this test a comparison is made on the execution times of the two backtracking algorithms. It generates N_NODES
-    graph, and it measures the execution time with time.timeit()
+    seeded graphs and runs the benchmark suite on them (see Benchmark.run_benchmark), plotting the median time of
+    the runs of each algorithm
 
     """
 
-    times_FC, times_MAC = list(), list()
+    results = Benchmark.run_benchmark(range(1, N_NODES + 1), range(1),
+                                      {"FC": Benchmark.SOLVERS["FC"], "MAC": Benchmark.SOLVERS["MAC"]})
+    medians = {(row["solver"], row["n_nodes"]): row["median_ms"] for row in results["summary"]}
 
-    for n in range(1, N_NODES + 1):
-        graph = Graph.Graph(n)
-        starting_node = graph.get_random_node()
-        graph.generate_edges(starting_node)
-
-        time_FC = timeit.timeit(lambda: graph.backtracking("ForwardChecking", animate=False), number=1)
-        time_MAC = timeit.timeit(lambda: graph.backtracking("Mac", animate=False), number=1)
-
-        times_FC.append(time_FC * 1000)
-        times_MAC.append(time_MAC * 1000)
-
-        del graph
+    times_FC = [medians[("FC", n)] for n in range(1, N_NODES + 1)]
+    times_MAC = [medians[("MAC", n)] for n in range(1, N_NODES + 1)]
 
     fig, ax = plt.subplots()
     ax.plot(range(1, N_NODES + 1), times_FC, label="Forward Checking")
     ax.plot(range(1, N_NODES + 1), times_MAC, label="Mac")
     ax.set_title("K" + str(len(COLORS)) + f" Graph Performance ({N_NODES} Nodes)")
     ax.set_xlabel("Number of Nodes")
-    ax.set_ylabel("Average Execution Time (ms)")
+    ax.set_ylabel("Median Execution Time (ms)")
 
     if N_NODES <= 30:
         ax.set_xticks(range(0, N_NODES + 1, 2))
@@ -51,35 +47,33 @@ def time_comparison():
     plt.show()
 
 
-def test_failed_assignment():
+def test_failed_assignment(workers=None):
     """
 
     In this test the number of assignments failed by the two algorithms is measured.
     Several graph instances are generated, each with an increasing number of nodes N_NODES. Subsequently,
     the process of creating the graph is iterated N_ITER times, and it is verified how many times the assignment
-    of colors to the nodes is not possible
+    of colors to the nodes is not possible. The instances are independent, so they are solved in parallel on a pool
+    of processes (see Batch.solve_batch); each instance has its own seed, so the results do not depend on the number
+    of workers or on the order in which the instances finish
 
-    """
-
-    fails_FC = []
-    fails_MAC = []
+    :param workers: (int) Number of worker processes, None to use all the cores
 
-    for j in range(1, N_NODES + 1, 5):
-        counter_fc_k3, counter_mac_k3 = 0, 0
+    """
 
-        for n in range(1, N_ITER + 1):
-            graph = Graph.Graph(j)
-            starting_node = graph.get_random_node()
-            graph.generate_edges(starting_node)
+    sizes = range(1, N_NODES + 1, 5)
+    specs = [(j, j * 1000000 + n, solver) for j in sizes for n in range(1, N_ITER + 1)
+             for solver in ("ForwardChecking", "Mac")]
 
-            if graph.backtracking("ForwardChecking", animate=False) == False:
-                counter_fc_k3 += 1
+    fails = {("ForwardChecking", j): 0 for j in sizes}
+    fails.update({("Mac", j): 0 for j in sizes})
 
-            if graph.backtracking("Mac", animate=False) == False:
-                counter_mac_k3 += 1
+    # The results arrive as the instances finish, in any order
+    for row in Batch.solve_batch(specs, workers):
+        fails[(row["solver"], row["n_nodes"])] += not row["colorable"]
 
-        fails_FC.append(counter_fc_k3)
-        fails_MAC.append(counter_mac_k3)
+    fails_FC = [fails[("ForwardChecking", j)] for j in sizes]
+    fails_MAC = [fails[("Mac", j)] for j in sizes]
 
     print("Fallimenti FC: ", fails_FC)
     print("Fallimenti MAC: ", fails_MAC)
@@ -97,6 +91,33 @@ def test_failed_assignment():
     plt.show()
 
 
+def propagation_comparison():
+    """
+
+    In this test the propagation engines of MAC (see Backtracking.PROPAGATORS) are compared on the same graphs.
+    For each graph size the MAC search is run once with each engine, and the number of arc revisions, the number of
+    supports searched and the execution time are printed
+
+    """
+
+    print(f"{'Nodes':>5} {'Engine':>9} {'Revisions':>10} {'Supports':>10} {'Time (ms)':>10}")
+
+    for n in range(5, N_NODES + 1, 5):
+        graph = Graph.Graph(n)
+        starting_node = graph.get_random_node()
+        graph.generate_edges(starting_node)
+
+        compiled = graph.compile()
+        initial_assignment = [BT.get_full_domain(len(COLORS))] * compiled.get_n_nodes()
+
+        for propagator in BT.PROPAGATORS:
+            state = BT.SearchState(compiled, initial_assignment, propagator)
+            time_mac = timeit.timeit(lambda: BT.backtrack(state, BT.mac, None, None, False, "MAC"), number=1)
+
+            stats = state.get_stats()
+            print(f"{n:>5} {propagator:>9} {stats.revisions:>10} {stats.support_checks:>10} {time_mac * 1000:>10.2f}")
+
+
 def test_graph_visualization(n_nodes, bt_type):
     """
 